@@ -0,0 +1,400 @@
+"""Бэкенды кэша, общие для всех процессов сервера.
+
+SQLiteCache хранит записи в файле SQLite и не требует внешних сервисов.
+TwoTierCache держит небольшой LRU в памяти процесса перед общим кэшем:
+каждое изменение ключа записывается в журнал в общем кэше, и процессы,
+прочитав журнал, выкидывают из LRU только изменённые ключи. Локальная
+копия живёт не дольше записи общего кэша.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# ограничение SQLite на число параметров запроса
+CHUNK_SIZE = 500
+
+_local_stores = {}
+_local_locks = {}
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    """LOCATION — путь к файлу базы кэша."""
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    cull_every = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        # после fork соединение родителя использовать нельзя
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+                ') WITHOUT ROWID')
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _wrote(self, count=1):
+        self._writes += count
+        if self._writes >= self.cull_every:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self):
+        connection = self._connection()
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count > self._max_entries:
+            # первыми уходят записи, которые и так скоро истекут
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires <= ?',
+            (key, self._dumps(value), self.get_backend_timeout(timeout),
+             time.time()))
+        self._wrote()
+        return cursor.rowcount > 0
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            'DELETE FROM cache WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found.")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._dumps(value), key))
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def get_many(self, keys, version=None):
+        return {key: value for key, (value, _) in
+                self.get_many_with_expiry(keys, version).items()}
+
+    def get_many_with_expiry(self, keys, version=None):
+        """{ключ: (значение, время истечения по time.time() или None)}."""
+        names = {
+            self.make_and_validate_key(key, version=version): key
+            for key in keys}
+        found = {}
+        now = time.time()
+        for chunk in _chunks(list(names)):
+            rows = self._connection().execute(
+                f'SELECT key, value, expires FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))}) '
+                f'AND (expires IS NULL OR expires > ?)',
+                (*chunk, now))
+            for name, value, expires in rows:
+                found[names[name]] = pickle.loads(value), expires
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self.make_and_validate_key(key, version=version),
+             self._dumps(value), expires)
+            for key, value in data.items()]
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)', rows)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self._wrote(len(rows))
+        return []
+
+    def delete_many(self, keys, version=None):
+        names = [self.make_and_validate_key(key, version=version)
+                 for key in keys]
+        for chunk in _chunks(names):
+            self._connection().execute(
+                f'DELETE FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})', chunk)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+
+class TwoTierCache(BaseCache):
+    """LRU процесса перед общим кэшем.
+
+    LOCATION — алиас общего кэша в CACHES. OPTIONS: MAX_ENTRIES — размер
+    LRU, LOCAL_TIMEOUT — сколько секунд запись живёт в LRU, CHECK_INTERVAL
+    — как часто читать журнал изменений (0 — при каждом чтении).
+    """
+    seq_key = 'two-tier:seq'
+    journal_limit = 1000
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self._check_interval = options.get('CHECK_INTERVAL', 1)
+        # LRU общий для всех потоков процесса, как у LocMemCache
+        self._store = _local_stores.setdefault(
+            location, {'entries': OrderedDict(), 'seq': None,
+                       'checked': 0.0})
+        self._lock = _local_locks.setdefault(location, threading.RLock())
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    @staticmethod
+    def _change_key(number):
+        return f'two-tier:change:{number}'
+
+    # локальный уровень
+
+    def _local_get(self, name):
+        entries = self._store['entries']
+        entry = entries.get(name)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del entries[name]
+            return None
+        entries.move_to_end(name)
+        return entry
+
+    def _local_set(self, name, value, timeout=DEFAULT_TIMEOUT):
+        """timeout — сколько секунд запись осталась жить в общем кэше."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        lifetime = self._local_timeout
+        if timeout is not None:
+            lifetime = min(lifetime, timeout)
+        if lifetime <= 0:
+            return
+        entries = self._store['entries']
+        entries[name] = (value, time.monotonic() + lifetime)
+        entries.move_to_end(name)
+        while len(entries) > self._max_entries:
+            entries.popitem(last=False)
+
+    def _fetch(self, keys, version):
+        """{ключ: (значение, секунд до истечения или None)} общего кэша.
+
+        Бэкенд без get_many_with_expiry не сообщает срок записи: тогда
+        копия живёт LOCAL_TIMEOUT и может пережить запись на это время.
+        """
+        get_many = getattr(self.shared, 'get_many_with_expiry', None)
+        if get_many is None:
+            return {key: (value, DEFAULT_TIMEOUT) for key, value in
+                    self.shared.get_many(keys, version).items()}
+        now = time.time()
+        return {
+            key: (value, None if expires is None else expires - now)
+            for key, (value, expires) in get_many(keys, version).items()}
+
+    def _sync(self):
+        """Выкидывает из LRU ключи, изменённые другими процессами."""
+        now = time.monotonic()
+        if now - self._store['checked'] < self._check_interval:
+            return
+        # после clear() общего кэша счётчика нет — как и до первой записи
+        seq = self.shared.get(self.seq_key, 0)
+        seen = self._store['seq']
+        changed = None
+        if seen is not None and seen <= seq <= seen + self.journal_limit:
+            keys = [self._change_key(number)
+                    for number in range(seen + 1, seq + 1)]
+            found = self.shared.get_many(keys)
+            if len(found) == len(keys):
+                changed = found.values()
+        with self._lock:
+            self._store['checked'] = now
+            if seq == seen:
+                return
+            if changed is None:
+                # журнал сброшен, переполнен или потерял записи
+                self._store['entries'].clear()
+            else:
+                for name in changed:
+                    self._store['entries'].pop(name, None)
+            self._store['seq'] = seq
+
+    def _invalidate(self, *names):
+        """Записывает изменённые ключи в журнал для других процессов."""
+        if not names:
+            return
+        # позиция в журнале должна быть известна до своих записей
+        self._sync()
+        try:
+            last = self.shared.incr(self.seq_key, len(names))
+        except ValueError:
+            self.shared.add(self.seq_key, 0, None)
+            last = self.shared.incr(self.seq_key, len(names))
+        first = last - len(names) + 1
+        # запись журнала нужна, пока копии в чужих LRU ещё живы
+        self.shared.set_many({
+            self._change_key(first + number): name
+            for number, name in enumerate(names)},
+            self._local_timeout + self._check_interval + 1)
+        with self._lock:
+            for name in names:
+                self._store['entries'].pop(name, None)
+            if self._store['seq'] == first - 1:
+                # журнал до нас прочитан, а свои изменения известны
+                self._store['seq'] = last
+
+    # интерфейс BaseCache
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # новая запись не может устареть в чужих LRU — журнал не нужен
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            name = self.make_and_validate_key(key, version=version)
+            with self._lock:
+                self._local_set(name, value, timeout)
+        return added
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        names = {
+            key: self.make_and_validate_key(key, version=version)
+            for key in keys}
+        found, missing = {}, []
+        with self._lock:
+            for key, name in names.items():
+                entry = self._local_get(name)
+                if entry is None:
+                    missing.append(key)
+                else:
+                    found[key] = entry[0]
+        if missing:
+            fetched = self._fetch(missing, version)
+            with self._lock:
+                for key, (value, remaining) in fetched.items():
+                    self._local_set(names[key], value, remaining)
+                    found[key] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        names = {key: self.make_and_validate_key(key, version=version)
+                 for key in data}
+        self._invalidate(*names.values())
+        with self._lock:
+            for key, value in data.items():
+                if key not in failed:
+                    self._local_set(names[key], value, timeout)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = self.shared.touch(key, timeout, version)
+        # срок локальной копии рассчитан от старого срока записи
+        self._invalidate(self.make_and_validate_key(key, version=version))
+        return touched
+
+    def delete(self, key, version=None):
+        deleted = self.shared.delete(key, version)
+        self._invalidate(self.make_and_validate_key(key, version=version))
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version)
+        self._invalidate(*(
+            self.make_and_validate_key(key, version=version)
+            for key in keys))
+
+    def has_key(self, key, version=None):
+        return self.get_many([key], version) != {}
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        self._invalidate(self.make_and_validate_key(key, version=version))
+        return value
+
+    def clear(self):
+        self.shared.clear()
+        with self._lock:
+            self._store['entries'].clear()
+            self._store['seq'] = None
@@ -0,0 +1,141 @@
+"""Замер SQLite при параллельных чтениях и записях.
+
+Все режимы ходят в базу через бэкенд Django, как представления: отдельный
+ConnectionHandler на процесс, PRAGMA из обработчика connection_created
+(core.sqlite), а после каждой операции — close_if_unusable_or_obsolete(),
+как по окончании запроса. Так режимы различаются только настройками.
+"""
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError
+from django.db.utils import ConnectionHandler
+from django.test.utils import override_settings
+
+MODES = {
+    # Django без настроек: соединение на запрос, без PRAGMA; блокировку
+    # ждёт sqlite3 со своим timeout по умолчанию
+    'default': {'max_age': 0, 'pragmas': False, 'options': {}},
+    'pragmas': {'max_age': 0, 'pragmas': True, 'options': {}},
+    'tuned': {'max_age': 60, 'pragmas': True, 'options': {}},
+}
+SEED_ROWS = 20000
+AUTHORS = 100
+
+
+def _database(path, mode):
+    """Соединение Django с базой замера, отдельное от алиасов проекта."""
+    handler = ConnectionHandler({DEFAULT_DB_ALIAS: {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': MODES[mode]['max_age'],
+        'OPTIONS': MODES[mode]['options'],
+    }})
+    return handler[DEFAULT_DB_ALIAS]
+
+
+def _pragmas(mode):
+    return override_settings(
+        SQLITE_PRAGMAS=settings.SQLITE_PRAGMAS if MODES[mode]['pragmas']
+        else {})
+
+
+def _seed(path, mode):
+    connection = _database(path, mode)
+    with _pragmas(mode):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE post (id INTEGER PRIMARY KEY, author INTEGER, '
+                'text TEXT, pub_date REAL)')
+            cursor.execute('CREATE INDEX post_author ON post (author, id)')
+        connection.set_autocommit(False)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO post (author, text, pub_date) '
+                'VALUES (%s, %s, %s)',
+                [(number % AUTHORS, 'x' * 200, time.time())
+                 for number in range(SEED_ROWS)])
+        connection.commit()
+    connection.close()
+
+
+def _operation(connection, rand, write_ratio):
+    """Одна операция: запись поста или чтение страницы ленты автора."""
+    with connection.cursor() as cursor:
+        if rand.random() < write_ratio:
+            cursor.execute(
+                'INSERT INTO post (author, text, pub_date) '
+                'VALUES (%s, %s, %s)',
+                (rand.randrange(AUTHORS), 'y' * 200, time.time()))
+            return 'writes'
+        cursor.execute(
+            'SELECT id, text, pub_date FROM post WHERE author = %s '
+            'ORDER BY id DESC LIMIT 10',
+            (rand.randrange(AUTHORS),))
+        cursor.fetchall()
+    return 'reads'
+
+
+def _worker(path, mode, deadline, write_ratio, seed):
+    rand = random.Random(seed)
+    done = {'reads': 0, 'writes': 0, 'errors': 0}
+    connection = _database(path, mode)
+    with _pragmas(mode):
+        while time.monotonic() < deadline:
+            try:
+                done[_operation(connection, rand, write_ratio)] += 1
+            except OperationalError:
+                # database is locked: ожидание блокировки истекло
+                done['errors'] += 1
+            finally:
+                # конец «запроса»: при CONN_MAX_AGE=0 соединение закрывается
+                connection.close_if_unusable_or_obsolete()
+    connection.close()
+    return done
+
+
+def run(mode, workers, seconds, write_ratio):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f'{mode}.sqlite3')
+        _seed(path, mode)
+        deadline = time.monotonic() + seconds
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.starmap(_worker, [
+                (path, mode, deadline, write_ratio, seed)
+                for seed in range(workers)])
+    return {key: sum(result[key] for result in results)
+            for key in ('reads', 'writes', 'errors')}
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пропускную способность SQLite при параллельных '
+            'чтениях и записях: без настроек, с PRAGMA и с постоянными '
+            'соединениями')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.2,
+            help='Доля записей среди операций')
+        parser.add_argument(
+            '--mode', action='append', choices=MODES,
+            help='Какие режимы замерить, по умолчанию все')
+
+    def handle(self, *args, **options):
+        seconds = options['seconds']
+        baseline = None
+        for mode in options['mode'] or MODES:
+            result = run(mode, options['workers'], seconds,
+                         options['write_ratio'])
+            total = (result['reads'] + result['writes']) / seconds
+            baseline = baseline or total
+            self.stdout.write(
+                f'{mode:>8}: {result["reads"] / seconds:8.0f} чтений/с '
+                f'{result["writes"] / seconds:8.0f} записей/с '
+                f'{result["errors"]:5} ошибок  x{total / baseline:.2f}')
@@ -0,0 +1,40 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ...routers import mark_synced
+
+
+class Command(BaseCommand):
+    help = ('Копирует SQLite-базу default в файлы реплик — локальная '
+            'замена репликации')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Алиасы реплик, по умолчанию DATABASE_REPLICAS')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('Реплики не заданы: DATABASE_REPLICAS пуст')
+
+        source = sqlite3.connect(connections['default'].settings_dict['NAME'])
+        try:
+            for alias in aliases:
+                if alias not in connections.settings:
+                    raise CommandError(f'Нет базы {alias} в DATABASES')
+                connections[alias].close()
+                target = sqlite3.connect(
+                    connections[alias].settings_dict['NAME'])
+                try:
+                    # онлайн-копия: писатели default не блокируются надолго
+                    source.backup(target)
+                finally:
+                    target.close()
+                mark_synced(alias)
+                self.stdout.write(self.style.SUCCESS(f'{alias}: обновлена'))
+        finally:
+            source.close()
@@ -0,0 +1,122 @@
+"""Гистограммы и счётчики в памяти процесса, вывод в формате Prometheus."""
+import bisect
+import threading
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_lock = threading.Lock()
+_collectors = []
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    inner = ','.join(f'{key}="{_escape(value)}"' for key, value in pairs)
+    return '{' + inner + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Для итогов, которые считает сам код приложения."""
+        with _lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield f'{self.name}{_labels(labels)} {value}'
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=TIME_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            counts, total = self.values.get(
+                key, ([0] * (len(self.buckets) + 1), 0))
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self):
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield (f'{self.name}_bucket{_labels(labels, le=bound)} '
+                       f'{cumulative}')
+            yield f'{self.name}_sum{_labels(labels)} {total}'
+            yield f'{self.name}_count{_labels(labels)} {cumulative}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _get(self, cls, name, documentation, *args):
+        with _lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, documentation, *args)
+        return self.metrics[name]
+
+    def counter(self, name, documentation):
+        return self._get(Counter, name, documentation)
+
+    def gauge(self, name, documentation):
+        return self._get(Gauge, name, documentation)
+
+    def histogram(self, name, documentation, buckets=TIME_BUCKETS):
+        return self._get(Histogram, name, documentation, buckets)
+
+    def clear(self):
+        for metric in self.metrics.values():
+            metric.values.clear()
+
+    def render(self):
+        for collect in _collectors:
+            collect(self)
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            with _lock:
+                lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def register_collector(collect):
+    """collect(registry) вызывается перед каждой выдачей метрик."""
+    if collect not in _collectors:
+        _collectors.append(collect)
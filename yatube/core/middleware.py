@@ -0,0 +1,193 @@
+"""Метрики запросов и закрепление чтений за default после записи.
+
+Обе прослойки работают и в синхронном, и в асинхронном стеке: под ASGI с
+POSTS_ASYNC_VIEWS асинхронные представления не уходят в поток ради них.
+SQL считает обёртка execute_wrapper, которую каждое соединение получает
+один раз; запрос она находит через contextvar, поэтому учитываются и
+запросы из потоков sync_to_async. Время шаблонов замеряет бэкенд
+core.template_backends.TimedDjangoTemplates.
+"""
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import COUNT_BUCKETS, registry
+from .routers import PIN_COOKIE, track_writes
+
+logger = logging.getLogger(__name__)
+
+_request_stats = contextvars.ContextVar('request_stats', default=None)
+
+REQUEST_TIME = registry.histogram(
+    'yatube_request_duration_seconds', 'Wall time of a request by view.')
+DB_TIME = registry.histogram(
+    'yatube_db_duration_seconds', 'Total SQL time of a request by view.')
+TEMPLATE_TIME = registry.histogram(
+    'yatube_template_duration_seconds',
+    'Total template render time of a request by view.')
+QUERIES = registry.histogram(
+    'yatube_db_queries', 'SQL queries per request by view.', COUNT_BUCKETS)
+OVER_BUDGET = registry.counter(
+    'yatube_query_budget_exceeded_total',
+    'Requests that ran more SQL queries than METRICS_QUERY_BUDGET.')
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def _install(connection):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+@receiver(connection_created)
+def install_on_connect(sender, connection, **kwargs):
+    _install(connection)
+
+
+@contextmanager
+def timed_template():
+    """Замер рендера шаблона для текущего запроса.
+
+    Вложенные рендеры (карточки постов через render_to_string) уже внутри
+    внешнего замера и второй раз не считаются.
+    """
+    stats = _request_stats.get()
+    if stats is None:
+        yield
+        return
+    stats.template_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.template_depth -= 1
+        if not stats.template_depth:
+            stats.template_time += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Число запросов к базе, время базы, шаблонов и ответа по view_name.
+
+    Доля замеряемых запросов — METRICS_SAMPLE_RATE, порог числа SQL —
+    METRICS_QUERY_BUDGET. Данные отдаются на /metrics/.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        # соединения, открытые до импорта модуля, сигнал не застал
+        for connection in connections.all():
+            _install(connection)
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self.record(request, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self.record(request, stats, time.perf_counter() - started)
+        return response
+
+    def record(self, request, stats, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+
+        REQUEST_TIME.observe(elapsed, view=view)
+        DB_TIME.observe(stats.db_time, view=view)
+        TEMPLATE_TIME.observe(stats.template_time, view=view)
+        QUERIES.observe(stats.queries, view=view)
+
+        if stats.queries > settings.METRICS_QUERY_BUDGET:
+            OVER_BUDGET.inc(view=view)
+            logger.warning(
+                'Query budget exceeded: %s ran %d queries (budget %d) on %s',
+                view, stats.queries, settings.METRICS_QUERY_BUDGET,
+                request.path)
+
+
+class ReplicaPinMiddleware:
+    """После записи в базу пользователь читает из default.
+
+    Cookie живёт DATABASE_STICKY_SECONDS — с запасом на отставание реплик.
+    Ставится и после GET, если представление что-то записало.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with track_writes() as writes:
+            response = self.get_response(request)
+        return self.pin(request, response, writes)
+
+    async def __acall__(self, request):
+        with track_writes() as writes:
+            response = await self.get_response(request)
+        return self.pin(request, response, writes)
+
+    def pin(self, request, response, writes):
+        if writes.wrote or request.method not in (
+                'GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.DATABASE_STICKY_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
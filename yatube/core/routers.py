@@ -0,0 +1,134 @@
+"""Чтение с реплик для читающих представлений.
+
+Запросы уходят на реплики только внутри представлений, обёрнутых в
+replica_reads, и только для GET и HEAD. Запись всегда идёт в default.
+После запроса, который писал в базу (это отмечает db_for_write, так что
+учитываются и записи на GET, вроде подписки), или запроса с изменяющим
+методом ReplicaPinMiddleware ставит cookie на DATABASE_STICKY_SECONDS:
+пока она жива, пользователь читает из default и видит свои изменения,
+даже если реплика отстаёт.
+
+Реплика выбирается одна на запрос. Всё, что кэшируется под штампами
+versions, получает в ключ read_position(): реплику и момент её последней
+синхронизации. Иначе страница, собранная с отстающей реплики, легла бы
+в кэш под свежим штампом и жила бы там до следующего изменения.
+"""
+import asyncio
+import contextvars
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+PIN_COOKIE = 'db_pin'
+SYNCED_KEY = 'core:replica:{}:synced'
+
+# алиас реплики, с которой читает текущий запрос, или None
+_replica_reads = contextvars.ContextVar('replica_reads', default=None)
+_writes = contextvars.ContextVar('replica_writes', default=None)
+_round_robin = itertools.count()
+
+
+class WriteLog:
+    """Была ли в запросе запись в базу.
+
+    Изменяемый объект, а не флаг в contextvar: асинхронные представления
+    ходят в базу в копиях контекста, и значение из них не вернулось бы.
+    """
+    wrote = False
+
+
+@contextmanager
+def track_writes():
+    log = WriteLog()
+    token = _writes.set(log)
+    try:
+        yield log
+    finally:
+        _writes.reset(token)
+
+
+def choose_replica(replicas, policy):
+    if policy == 'random':
+        return random.choice(replicas)
+    if policy == 'round_robin':
+        return replicas[next(_round_robin) % len(replicas)]
+    raise ValueError(f'Неизвестная политика выбора реплики: {policy}')
+
+
+class ReplicaRouter:
+    """DATABASE_REPLICAS — алиасы реплик, DATABASE_REPLICA_POLICY —
+    'round_robin' или 'random'."""
+
+    def db_for_read(self, model, **hints):
+        return _replica_reads.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        log = _writes.get()
+        if log is not None:
+            log.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики — копии default, объекты из них связываются свободно
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def use_replicas(request):
+    return (request.method in ('GET', 'HEAD')
+            and PIN_COOKIE not in request.COOKIES)
+
+
+def _replica_for(request):
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas or not use_replicas(request):
+        return None
+    return choose_replica(replicas, settings.DATABASE_REPLICA_POLICY)
+
+
+def mark_synced(alias):
+    """Вызывается после обновления реплики: меняет её read_position()."""
+    cache.set(SYNCED_KEY.format(alias), time.time_ns(), None)
+
+
+def replica_synced():
+    """(алиас, момент синхронизации в нс) реплики запроса или None."""
+    alias = _replica_reads.get()
+    if alias is None:
+        return None
+    return alias, cache.get(SYNCED_KEY.format(alias), 0)
+
+
+def read_position():
+    """'' при чтении из default, иначе 'алиас@момент синхронизации'."""
+    synced = replica_synced()
+    return '' if synced is None else '{}@{}'.format(*synced)
+
+
+def replica_reads(view):
+    """Разрешает представлению читать с реплик."""
+    if asyncio.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(_replica_for(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _replica_reads.set(_replica_for(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
@@ -0,0 +1,24 @@
+"""Настройка соединений SQLite для нескольких процессов сервера.
+
+WAL позволяет читать параллельно с записью, synchronous=NORMAL в режиме
+WAL не теряет целостность и не ждёт fsync на каждый коммит, а
+busy_timeout заставляет писателя подождать блокировку вместо немедленной
+ошибки database is locked. PRAGMA выполняются один раз на соединение, а
+CONN_MAX_AGE переиспользует соединения между запросами.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def tune(connection, pragmas):
+    """Выполняет PRAGMA на соединении sqlite3 из модуля стандартной
+    библиотеки."""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        tune(connection.connection, settings.SQLITE_PRAGMAS)
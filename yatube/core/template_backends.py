@@ -0,0 +1,29 @@
+from django.template.backends.django import (DjangoTemplates, Template,
+                                             reraise)
+from django.template import TemplateDoesNotExist
+
+from .middleware import timed_template
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed_template():
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, шаблоны которого замеряет MetricsMiddleware.
+
+    {% include %} рендерится внутри внешнего шаблона и отдельно не
+    замеряется.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,46 @@
+import copy
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Отключает фоновые пулы: их процессы не видят тестовую базу.
+
+    Файловые кэши переносятся во временный каталог, чтобы тесты не
+    трогали кэш рабочего сервера. Реплики для тестов маршрутизации —
+    зеркала тестовой default.
+    """
+
+    replicas = ('replica_1', 'replica_2')
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.POSTS_THUMBNAIL_WORKERS = 0
+
+        for alias in self.replicas:
+            settings.DATABASES.setdefault(alias, {
+                **settings.DATABASES['default'],
+                'TEST': {'MIRROR': 'default'},
+            })
+        # ConnectionHandler держит тот же словарь, но без значений
+        # по умолчанию для новых алиасов
+        connections.configure_settings(settings.DATABASES)
+
+        self._cache_dir = tempfile.TemporaryDirectory()
+        cache_settings = copy.deepcopy(settings.CACHES)
+        for alias, options in cache_settings.items():
+            if options['BACKEND'] == 'core.cache.SQLiteCache':
+                options['LOCATION'] = os.path.join(
+                    self._cache_dir.name, f'{alias}.sqlite3')
+        self._cache_settings = override_settings(CACHES=cache_settings)
+        self._cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_settings.disable()
+        self._cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
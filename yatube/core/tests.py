@@ -1,4 +1,30 @@
-from django.test import TestCase
+import os
+import sqlite3
+import tempfile
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from posts.fragments import card_key
+
+from .cache import SQLiteCache, TwoTierCache
+from .management.commands import bench_sqlite
+from .metrics import registry
+from .middleware import MetricsMiddleware, ReplicaPinMiddleware
+from .routers import (PIN_COOKIE, ReplicaRouter, choose_replica,
+                      mark_synced, read_position, replica_reads)
+from .sqlite import tune
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -7,3 +33,275 @@ class ViewTestClass(TestCase):
 
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.clear()
+
+    def test_request_metrics(self):
+        self.client.get('/')
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE yatube_db_queries histogram', body)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            body)
+        self.assertIn('yatube_template_duration_seconds_sum'
+                      '{view="posts:index"}', body)
+
+    async def test_async_stack_stays_async(self):
+        async def view(request):
+            await sync_to_async(User.objects.count)()
+            return HttpResponse('ok')
+
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 200)
+        # запрос из потока sync_to_async тоже посчитан
+        self.assertIn('yatube_db_queries_sum{view="unresolved"} 1',
+                      await sync_to_async(registry.render)())
+
+    @override_settings(METRICS_QUERY_BUDGET=0)
+    def test_query_budget(self):
+        self.client.get('/')
+        body = self.client.get('/metrics/').content.decode()
+        self.assertIn(
+            'yatube_query_budget_exceeded_total{view="posts:index"} 1', body)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_sampling(self):
+        self.client.get('/')
+        body = self.client.get('/metrics/').content.decode()
+        self.assertNotIn('view="posts:index"', body)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_endpoint_restricted(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(path, {})
+        # второй экземпляр на том же файле — как другой процесс сервера
+        self.other = SQLiteCache(path, {})
+
+    def test_shared_between_instances(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.other.get('key'), {'value': 1})
+        self.other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_and_expiry(self):
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.other.add('key', 2))
+        self.cache.set('short', 1, 0.01)
+        time.sleep(0.02)
+        self.assertFalse(self.cache.has_key('short'))
+        self.assertTrue(self.cache.add('short', 2))
+        self.assertEqual(self.other.get('short'), 2)
+
+    def test_many_and_incr(self):
+        self.cache.set_many({'a': 1, 'b': 2}, None)
+        self.assertEqual(self.other.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2})
+        self.assertEqual(self.other.incr('a', 10), 11)
+        self.assertEqual(self.cache.get('a'), 11)
+        with self.assertRaises(ValueError):
+            self.cache.incr('c')
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.other.get_many(['a', 'b']), {})
+
+    def test_cull(self):
+        cache = SQLiteCache(self.cache._path, {
+            'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}})
+        cache.set_many({f'key{i}': i for i in range(cache.cull_every)})
+        count, = cache._connection().execute(
+            'SELECT COUNT(*) FROM cache').fetchone()
+        self.assertEqual(count, cache.cull_every // 2)
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    options = {'OPTIONS': {'CHECK_INTERVAL': 0, 'MAX_ENTRIES': 3}}
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.cache = TwoTierCache('shared', self.options)
+        self.cache.clear()
+        # отдельный LRU — как у другого процесса
+        self.other = TwoTierCache('shared', self.options)
+        self.other._store = {
+            'entries': OrderedDict(), 'seq': None, 'checked': 0.0}
+
+    def test_reads_served_from_local_tier(self):
+        self.cache.set('key', 'value')
+        caches['shared'].delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_writes_invalidate_other_processes(self):
+        self.cache.set('key', 'old')
+        self.assertEqual(self.other.get('key'), 'old')
+        self.cache.set('key', 'new')
+        self.assertEqual(self.other.get('key'), 'new')
+        self.cache.delete('key')
+        self.assertIsNone(self.other.get('key'))
+
+    def test_add_does_not_flush_local_tier(self):
+        self.other.set('key', 'value')
+        self.cache.get('key')
+        self.other.add('new', 1)
+        caches['shared'].delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_other_keys_stay_in_local_tier(self):
+        self.cache.set('key', 'value')
+        self.other.set('unrelated', 1)
+        self.other.incr('unrelated')
+        caches['shared'].delete('key')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_lost_journal_flushes_local_tier(self):
+        self.cache.set('key', 'value')
+        self.other.set('unrelated', 1)
+        caches['shared'].delete(self.cache._change_key(
+            caches['shared'].get(self.cache.seq_key)))
+        caches['shared'].delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_local_copy_expires_with_shared_entry(self):
+        self.other.set('key', 'value', timeout=2)
+        self.assertEqual(self.cache.get('key'), 'value')
+        _, deadline = self.cache._store['entries'][self.cache.make_key('key')]
+        self.assertLessEqual(deadline - time.monotonic(), 2)
+
+    def test_local_tier_is_bounded(self):
+        self.cache.set_many({f'key{i}': i for i in range(5)})
+        self.assertEqual(list(self.cache._store['entries']),
+                         [self.cache.make_key(f'key{i}') for i in (2, 3, 4)])
+        self.assertEqual(self.cache.get('key0'), 0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'])
+class ReplicaRouterTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def read_db(self, method='GET', pinned=False):
+        request = RequestFactory().generic(method, '/')
+        if pinned:
+            request.COOKIES[PIN_COOKIE] = '1'
+        return replica_reads(
+            lambda request: self.router.db_for_read(None))(request)
+
+    def test_policies(self):
+        replicas = ['replica_1', 'replica_2']
+        first = choose_replica(replicas, 'round_robin')
+        self.assertNotEqual(choose_replica(replicas, 'round_robin'), first)
+        self.assertIn(choose_replica(replicas, 'random'), replicas)
+        with self.assertRaises(ValueError):
+            choose_replica(replicas, 'fastest')
+
+    def test_reads_only_inside_decorated_views(self):
+        self.assertIn(self.read_db(), ('replica_1', 'replica_2'))
+        self.assertEqual(self.router.db_for_read(None), 'default')
+        self.assertEqual(self.router.db_for_write(None), 'default')
+        self.assertEqual(self.read_db('POST'), 'default')
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.read_db(), 'default')
+
+    def test_cache_keys_follow_replica_sync(self):
+        post = SimpleNamespace(pk=1, author_id=1, group_id=None)
+
+        def read(request):
+            return read_position(), card_key(post)
+
+        view = replica_reads(read)
+        request = RequestFactory().get('/')
+        self.assertEqual(read_position(), '')
+        with override_settings(DATABASE_REPLICAS=['replica_1']):
+            position, key = view(request)
+            mark_synced('replica_1')
+            synced_position, synced_key = view(request)
+        self.assertTrue(position.startswith('replica_1@'))
+        self.assertNotEqual(synced_position, position)
+        self.assertEqual(len({card_key(post), key, synced_key}), 3)
+
+    def test_pinned_after_write(self):
+        self.assertEqual(self.read_db(pinned=True), 'default')
+        response = self.client.post('/auth/login/')
+        self.assertEqual(
+            response.cookies[PIN_COOKIE]['max-age'],
+            settings.DATABASE_STICKY_SECONDS)
+        response = self.client.get('/')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class ReplicaPinTests(TestCase):
+    async def test_async_write_pins(self):
+        async def view(request):
+            await sync_to_async(User.objects.create_user)('writer')
+            return HttpResponse('ok')
+
+        middleware = ReplicaPinMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_pinned_after_write_on_get(self):
+        reader = User.objects.create_user(username='reader')
+        User.objects.create_user(username='author')
+        self.client.force_login(reader)
+        response = self.client.get('/profile/author/')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = self.client.get('/profile/author/follow/')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'])
+class ReplicaReadsTests(TransactionTestCase):
+    """Реплики — другие соединения: данные должны быть закоммичены."""
+    databases = '__all__'
+
+    def test_views_read_from_replicas(self):
+        User.objects.create_user(username='reader')
+        with CaptureQueriesContext(connections['replica_1']) as first, \
+                CaptureQueriesContext(connections['replica_2']) as second, \
+                CaptureQueriesContext(connections['default']) as primary:
+            response = self.client.get('/profile/reader/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(first) + len(second), 0)
+        self.assertEqual(len(primary), 0)
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    databases = {'default'}
+
+    def test_pragmas_applied_to_new_connections(self):
+        with connections['default'].cursor() as cursor:
+            # mmap_size у базы в памяти не задаётся
+            for name in ('busy_timeout', 'cache_size'):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(
+                    cursor.fetchone()[0], settings.SQLITE_PRAGMAS[name])
+
+    def test_tune_switches_file_to_wal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            connection = sqlite3.connect(os.path.join(directory, 'db'))
+            tune(connection, settings.SQLITE_PRAGMAS)
+            mode, = connection.execute('PRAGMA journal_mode').fetchone()
+            connection.close()
+        self.assertEqual(mode, 'wal')
+
+    def test_benchmark(self):
+        result = bench_sqlite.run('tuned', 2, 0.2, 0.5)
+        self.assertGreater(result['reads'], 0)
+        self.assertGreater(result['writes'], 0)
+        self.assertEqual(result['errors'], 0)
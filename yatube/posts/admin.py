@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Post, Group
+from .search import get_backend
 
 
 @admin.register(Post)
@@ -12,6 +13,13 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
     # prepopulated_fields = {"slug": ("name",)}
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return super().get_search_results(
+                request, queryset, search_term)
+        post_ids = get_backend().search(search_term)
+        return queryset.filter(pk__in=post_ids), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
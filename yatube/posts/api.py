@@ -0,0 +1,215 @@
+"""JSON API только для чтения: ленты, пост и его комментарии.
+
+Строки читаются через values_list() только нужными столбцами, без
+экземпляров моделей, а JSON отдаётся потоком по строке. Параметры:
+?fields=id,text — какие поля вернуть, ?limit= — размер страницы,
+?cursor= — продолжение со значения next из прошлого ответа (keyset, как
+у CursorPaginator, только вперёд). Ответ сжимается gzip, если клиент
+прислал Accept-Encoding: gzip.
+"""
+import json
+from functools import wraps
+
+from core.routers import replica_reads
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe
+
+from .conditional import (conditional, group_scopes, index_scopes,
+                          post_scopes, profile_scopes, timeline_scopes)
+from .models import Comment, Group, Post, Timeline, User
+from .pagination import FORWARD, decode_cursor, encode_cursor
+from .views import TIMELINE_KEYS
+
+PER_PAGE = 10
+MAX_LIMIT = 100
+CONTENT_TYPE = 'application/json'
+
+# имя поля в ответе -> столбец values_list()
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+TIMELINE_FIELDS = {
+    **{name: f'post__{column}' for name, column in POST_FIELDS.items()},
+    # ключ сортировки Timeline повторяет пост: JOIN ради него не нужен
+    'id': 'post_id',
+    'pub_date': 'pub_date',
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+
+_storage = Post._meta.get_field('image').storage
+CONVERTERS = {'image': lambda name: _storage.url(name) if name else None}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False,
+                      separators=(',', ':'))
+
+
+def _error(message, status):
+    return HttpResponse(
+        _dumps({'error': message}), status=status, content_type=CONTENT_TYPE)
+
+
+def api(get_scopes, login=False):
+    """Только GET, чтение с реплик, условный GET, gzip и ошибки в JSON."""
+    def decorator(view):
+        checked = conditional(get_scopes)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if login and not request.user.is_authenticated:
+                return _error('Нужна авторизация', 401)
+            try:
+                return checked(request, *args, **kwargs)
+            except ApiError as error:
+                return _error(str(error), error.status)
+            except Http404:
+                return _error('Не найдено', 404)
+        return gzip_page(require_safe(replica_reads(wrapper)))
+    return decorator
+
+
+def parse_fields(request, available):
+    """Поля из ?fields= в порядке запроса, по умолчанию все."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    names = list(dict.fromkeys(name for name in raw.split(',') if name))
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown) or raw}')
+    return names
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', PER_PAGE))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f'limit должен быть от 1 до {MAX_LIMIT}')
+    return limit
+
+
+def _item(row, fields, positions):
+    return {
+        name: CONVERTERS[name](row[position]) if name in CONVERTERS
+        else row[position]
+        for name, position in zip(fields, positions)}
+
+
+def _stream(rows, fields, positions, next_cursor):
+    yield '{"results":['
+    for number, row in enumerate(rows):
+        yield (',' if number else '') + _dumps(
+            _item(row, fields, positions))
+    yield f'],"next":{_dumps(next_cursor)}}}\n'
+
+
+def list_response(request, queryset, available, keys=('pub_date', 'pk'),
+                  descending=True):
+    """Страница выборки после ?cursor= потоком JSON.
+
+    Строки выбираются до начала ответа: ошибки базы и маршрутизация на
+    реплику приходятся на время работы представления, а не отдачи тела.
+    """
+    fields = parse_fields(request, available)
+    limit = parse_limit(request)
+    key, id_key = keys
+    columns = list(dict.fromkeys(
+        [*(available[name] for name in fields), key, id_key]))
+
+    position = decode_cursor(request.GET.get('cursor') or '')
+    if position is not None and position[0] == FORWARD:
+        _, value, pk = position
+        lookup = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{key}__{lookup}': value})
+            | Q(**{key: value, f'{id_key}__{lookup}': pk}))
+    order = (f'-{key}', f'-{id_key}') if descending else (key, id_key)
+    rows = list(queryset.order_by(*order).values_list(*columns)[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            FORWARD, last[columns.index(key)], last[columns.index(id_key)])
+    positions = [columns.index(available[name]) for name in fields]
+    return StreamingHttpResponse(
+        _stream(rows, fields, positions, next_cursor),
+        content_type=CONTENT_TYPE)
+
+
+def _pk_or_404(queryset, **lookup):
+    pk = queryset.filter(**lookup).values_list('pk', flat=True).first()
+    if pk is None:
+        raise Http404
+    return pk
+
+
+@api(index_scopes)
+def index(request):
+    return list_response(request, Post.objects.all(), POST_FIELDS)
+
+
+@api(group_scopes)
+def group_posts(request, slug):
+    group_id = _pk_or_404(Group.objects, slug=slug)
+    return list_response(
+        request, Post.objects.filter(group_id=group_id), POST_FIELDS)
+
+
+@api(profile_scopes)
+def profile(request, username):
+    author_id = _pk_or_404(User.objects, username=username)
+    return list_response(
+        request, Post.objects.filter(author_id=author_id), POST_FIELDS)
+
+
+@api(timeline_scopes, login=True)
+def follow_index(request):
+    return list_response(
+        request, Timeline.objects.filter(user_id=request.user.id),
+        TIMELINE_FIELDS, keys=TIMELINE_KEYS)
+
+
+@api(post_scopes)
+def post_detail(request, post_id):
+    fields = parse_fields(request, POST_FIELDS)
+    columns = [POST_FIELDS[name] for name in fields]
+    row = Post.objects.filter(pk=post_id).values_list(*columns).first()
+    if row is None:
+        raise Http404
+    return HttpResponse(
+        _dumps(_item(row, fields, range(len(fields)))),
+        content_type=CONTENT_TYPE)
+
+
+@api(post_scopes)
+def post_comments(request, post_id):
+    """Комментарии от старых к новым, как на странице поста."""
+    post_id = _pk_or_404(Post.objects, pk=post_id)
+    return list_response(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        keys=('created', 'pk'), descending=False)
@@ -5,3 +5,12 @@ class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'posts'
     verbose_name = 'Группы'
+
+    def ready(self):
+        from core.metrics import register_collector
+
+        from . import signals  # noqa: F401
+        from . import fragments, thumbnails
+
+        register_collector(fragments.collect_metrics)
+        register_collector(thumbnails.collect_metrics)
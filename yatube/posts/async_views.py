@@ -0,0 +1,174 @@
+"""Асинхронные версии читающих представлений для запуска под ASGI.
+
+Независимые запросы к базе выполняются через asyncio.gather. Шаблон
+рендерится в потоке через sync_to_async, но всё, что он читает из базы,
+загружается заранее.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from core.routers import replica_reads
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.shortcuts import render
+
+from . import follows
+from .conditional import (INDEX_FRAGMENT_SECONDS, INDEX_FROZEN_SECONDS,
+                          conditional, group_scopes, index_scopes,
+                          index_version, post_scopes, profile_scopes,
+                          timeline_scopes)
+from .counters import author_stats
+from .forms import CommentForm
+from .models import AuthorStats, Group, Post, Timeline, User
+from .invalidation import INDEX
+from .pagination import CursorPaginator, cached_count
+from .views import TIMELINE_KEYS, comment_page
+
+PER_PAGE = 10
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches.')
+
+
+async def get_request_user(request):
+    """request.user ленив и ходит в базу — вычисляем его в потоке."""
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+def login_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await get_request_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def aget_paginator_slice(post_list, request, count=None,
+                               keys=('pub_date', 'pk'), scope=None):
+    """Асинхронный аналог views.get_paginator_slice."""
+    cursor = request.GET.get('cursor')
+    if cursor is not None or settings.POSTS_PAGINATION == 'cursor':
+        paginator = CursorPaginator(post_list, PER_PAGE, keys)
+        return await sync_to_async(paginator.get_page)(cursor)
+
+    paginator = Paginator(post_list, PER_PAGE)
+    if count is None and scope is not None:
+        count = await sync_to_async(cached_count)(post_list, scope)
+    paginator.count = await post_list.acount() if count is None else count
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = [post async for post in page_obj.object_list]
+    return page_obj
+
+
+async def arender(request, template_name, context):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+@replica_reads
+@conditional(index_scopes, freeze=INDEX_FROZEN_SECONDS)
+async def index(request):
+    page_obj, _, feed_version = await asyncio.gather(
+        aget_paginator_slice(Post.objects.for_feed(), request, scope=INDEX),
+        get_request_user(request),
+        sync_to_async(index_version)(request))
+
+    context = {'page_obj': page_obj, 'is_home_page': True,
+               'feed_version': feed_version,
+               'feed_timeout': INDEX_FRAGMENT_SECONDS}
+    return await arender(request, 'posts/index.html', context)
+
+
+@replica_reads
+@conditional(group_scopes)
+async def group_posts(request, slug):
+    # id группы нужен для ключа кэша числа постов
+    group = await aget_object_or_404(Group.objects.all(), slug=slug)
+    post_list = Post.objects.for_feed().filter(group=group)
+    page_obj, _ = await asyncio.gather(
+        aget_paginator_slice(post_list, request, scope=('group', group.pk)),
+        get_request_user(request))
+
+    context = {'group': group, 'page_obj': page_obj}
+    return await arender(request, 'posts/group_list.html', context)
+
+
+@replica_reads
+@conditional(post_scopes)
+async def post_detail(request, post_id):
+    post, comments, _ = await asyncio.gather(
+        aget_object_or_404(Post.objects.for_detail(), pk=post_id),
+        sync_to_async(comment_page)(post_id, request.GET.get('comments')),
+        get_request_user(request))
+    form = CommentForm(request.POST or None)
+
+    context = {'post': post, 'form': form, 'comments': comments}
+    return await arender(request, 'posts/post_detail.html', context)
+
+
+async def get_follow_state(request):
+    user = await get_request_user(request)
+    if user.is_anonymous:
+        return None
+    state = follows.FollowState(user.id)
+    # множество загружается из кэша или одним запросом в потоке
+    await sync_to_async(lambda: state.ids)()
+    return state
+
+
+async def get_stats(username):
+    try:
+        return await AuthorStats.objects.aget(user__username=username)
+    except AuthorStats.DoesNotExist:
+        user = await aget_object_or_404(User.objects.all(), username=username)
+        return await sync_to_async(author_stats)(user)
+
+
+@replica_reads
+@conditional(profile_scopes)
+async def profile(request, username):
+    post_list = Post.objects.for_feed().filter(author__username=username)
+
+    async def stats_and_page():
+        # число постов берётся из счётчиков автора, без COUNT(*)
+        stats = await get_stats(username)
+        return stats, await aget_paginator_slice(
+            post_list, request, count=stats.posts_count)
+
+    user_obj, follow_state, (stats, page_obj) = await asyncio.gather(
+        aget_object_or_404(User.objects.all(), username=username),
+        get_follow_state(request),
+        stats_and_page())
+    following = follow_state and follow_state.follows(user_obj.pk)
+
+    context = {
+        'page_obj': page_obj,
+        'user_obj': user_obj,
+        'following': following,
+        'subscribers': stats.followers_count,
+        'posts_count': stats.posts_count}
+    return await arender(request, 'posts/profile.html', context)
+
+
+@login_required
+@replica_reads
+@conditional(timeline_scopes)
+async def follow_index(request):
+    entries = Timeline.objects.filter(user=request.user).select_related(
+        'post__author', 'post__group')
+    page_obj = await aget_paginator_slice(
+        entries, request, keys=TIMELINE_KEYS,
+        scope=('timeline', request.user.id))
+    page_obj.object_list = [entry.post for entry in page_obj]
+
+    context = {'page_obj': page_obj, 'is_home_page': True}
+    return await arender(request, 'posts/follow.html', context)
@@ -0,0 +1,408 @@
+"""Наполнение базы реалистичными объёмами и замеры страниц posts.
+
+Используется командами seed_posts, bench_posts, bench_follow_graph и
+bench_api.
+"""
+import itertools
+import random
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from . import counters, search, timeline
+from .graph import FollowGraph
+from .models import Comment, Follow, Group, Post, User
+from .pagination import FORWARD, encode_cursor
+
+BATCH_SIZE = 5000
+PER_PAGE = 10
+
+
+def _batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _bulk(model, rows):
+    count = 0
+    for batch in _batched(rows):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        count += len(batch)
+    return count
+
+
+@contextmanager
+def explicit_pub_date():
+    """auto_now_add затёр бы даты: ленты состояли бы из одной секунды."""
+    field = Post._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def power_law_weights(size, alpha):
+    """Веса 1/rank^alpha: немногие авторы собирают большинство подписок."""
+    return list(itertools.accumulate(
+        1 / rank ** alpha for rank in range(1, size + 1)))
+
+
+def seed(users, posts, groups, follows, comments, alpha=1.1,
+         derived=True, seed_value=0, log=print):
+    """Создаёт данные пачками bulk_create, сигналы не срабатывают.
+
+    Производные таблицы (ленты, счётчики, поиск) пересобираются в конце,
+    если derived=True.
+    """
+    rnd = random.Random(seed_value)
+    password = make_password(None)
+    prefix = f'bench{int(time.time())}'
+
+    started = time.monotonic()
+    _bulk(User, (User(username=f'{prefix}_{i}', password=password)
+                 for i in range(users)))
+    user_ids = list(User.objects.filter(
+        username__startswith=f'{prefix}_').values_list('pk', flat=True))
+    log(f'users: {len(user_ids)}')
+
+    _bulk(Group, (Group(title=f'Группа {prefix} {i}',
+                        slug=f'{prefix}-{i}',
+                        description='Сгенерированная группа')
+                  for i in range(groups)))
+    group_ids = list(Group.objects.filter(
+        slug__startswith=f'{prefix}-').values_list('pk', flat=True))
+    log(f'groups: {len(group_ids)}')
+
+    weights = power_law_weights(len(user_ids), alpha)
+    now = timezone.now()
+    step = timezone.timedelta(days=365) / max(posts, 1)
+
+    def post_rows():
+        authors = rnd.choices(user_ids, cum_weights=weights, k=posts)
+        for i, author_id in enumerate(authors):
+            yield Post(
+                text=f'Пост {i} о {rnd.choice(("django", "sqlite", "кэш"))}',
+                author_id=author_id,
+                group_id=rnd.choice(group_ids) if group_ids else None,
+                pub_date=now - step * (posts - i))
+
+    with explicit_pub_date():
+        log(f'posts: {_bulk(Post, post_rows())}')
+
+    def follow_rows():
+        for user_id in user_ids:
+            count = min(rnd.randint(0, follows * 2), len(user_ids) - 1)
+            authors = set(rnd.choices(
+                user_ids, cum_weights=weights, k=count))
+            authors.discard(user_id)
+            for author_id in authors:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    log(f'follows: {_bulk(Follow, follow_rows())}')
+
+    post_ids = list(Post.objects.order_by('-pk').values_list(
+        'pk', flat=True)[:max(posts, 1)])
+    post_weights = power_law_weights(len(post_ids), alpha) if post_ids else []
+
+    def comment_rows():
+        if not post_ids:
+            return
+        chosen = rnd.choices(post_ids, cum_weights=post_weights, k=comments)
+        for post_id in chosen:
+            yield Comment(post_id=post_id, author_id=rnd.choice(user_ids),
+                          text='Сгенерированный комментарий')
+
+    log(f'comments: {_bulk(Comment, comment_rows())}')
+
+    if derived:
+        with transaction.atomic():
+            timeline.rebuild()
+            counters.reconcile()
+            search.rebuild()
+        log('derived tables rebuilt')
+    log(f'seeded in {time.monotonic() - started:.1f}s')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def _page_params(post_list, depth):
+    if depth <= 1:
+        return {}
+    if settings.POSTS_PAGINATION != 'cursor':
+        return {'page': depth}
+    anchor = post_list.order_by('-pub_date', '-pk')[
+        (depth - 1) * PER_PAGE - 1:(depth - 1) * PER_PAGE].first()
+    if anchor is None:
+        return {'cursor': ''}
+    return {'cursor': encode_cursor(FORWARD, anchor.pub_date, anchor.pk)}
+
+
+def _subjects():
+    """Самый активный автор, читатель с подписками, группа и пост."""
+    author = User.objects.filter(
+        stats__posts_count__gt=0).order_by('-stats__posts_count').first()
+    reader = User.objects.filter(
+        follower__isnull=False).order_by('-pk').first()
+    group = Group.objects.filter(posts__isnull=False).first()
+    post = Post.objects.filter(author=author).first()
+    if not (author and reader and group and post):
+        raise ValueError('Сначала наполните базу: manage.py seed_posts')
+    return author, reader, group, post
+
+
+def targets(depths):
+    """(имя, url, параметры, пользователь) для каждого GET-маршрута posts."""
+    author, reader, group, post = _subjects()
+
+    feeds = [
+        ('index', reverse('posts:index'), Post.objects.all(), None),
+        ('group_list', reverse('posts:group_list', args=[group.slug]),
+         Post.objects.filter(group=group), None),
+        ('profile', reverse('posts:profile', args=[author.username]),
+         Post.objects.filter(author=author), None),
+        ('follow_index', reverse('posts:follow_index'),
+         Post.objects.filter(timeline__user=reader), reader),
+    ]
+    for name, url, post_list, user in feeds:
+        for depth in depths:
+            yield (f'{name}@{depth}', url,
+                   _page_params(post_list, depth), user)
+
+    yield ('post_detail', reverse('posts:post_detail', args=[post.pk]),
+           {}, None)
+    yield ('post_comments', reverse('posts:post_comments', args=[post.pk]),
+           {}, None)
+    yield ('search', reverse('posts:search'), {'q': 'django'}, None)
+    yield ('hot', reverse('posts:hot'), {}, None)
+    yield ('hot_groups', reverse('posts:hot_groups'), {}, None)
+    yield ('post_create', reverse('posts:post_create'), {}, author)
+    yield ('post_edit', reverse('posts:post_edit', args=[post.pk]),
+           {}, author)
+    # GET без формы ничего не сохраняет и только перенаправляет на пост
+    yield ('add_comment', reverse('posts:add_comment', args=[post.pk]),
+           {}, reader)
+
+    for fmt in ('rss', 'atom', 'json'):
+        yield (f'index_feed:{fmt}', reverse('posts:index_feed', args=[fmt]),
+               {}, None)
+        yield (f'group_feed:{fmt}',
+               reverse('posts:group_feed', args=[group.slug, fmt]), {}, None)
+        yield (f'profile_feed:{fmt}',
+               reverse('posts:profile_feed', args=[author.username, fmt]),
+               {}, None)
+
+    for name, url, user in api_targets():
+        yield (f'api_{name}', url, {}, user)
+
+    # подписка и отписка меняют базу: вторая из пары возвращает её как было
+    pair = ['profile_follow', 'profile_unfollow']
+    if Follow.objects.filter(user=reader, author=author).exists():
+        pair.reverse()
+    for name in pair:
+        yield (name, reverse(f'posts:{name}', args=[author.username]),
+               {}, reader)
+
+
+def _body(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def measure(url, params, user, repeat, **headers):
+    # адрес вне INTERNAL_IPS: debug_toolbar не должен попасть в замеры
+    client = Client(REMOTE_ADDR='10.0.0.1')
+    if user is not None:
+        client.force_login(user)
+    _body(client.get(url, params, **headers))  # прогрев
+
+    timings, queries = [], []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url, params, **headers)
+            body = _body(response)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+    return {
+        'status': response.status_code,
+        'bytes': len(body),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p90_ms': round(percentile(timings, 0.9), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'queries': max(queries),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(depths, repeat, log=print):
+    results = {}
+    for name, url, params, user in targets(depths):
+        results[name] = measure(url, params, user, repeat)
+        log(f'{name:<20} {results[name]}')
+    return {
+        'revision': git_revision(),
+        'created': timezone.now().isoformat(),
+        'pagination': settings.POSTS_PAGINATION,
+        'repeat': repeat,
+        'counts': {
+            'users': User.objects.count(),
+            'posts': Post.objects.count(),
+            'follows': Follow.objects.count(),
+            'comments': Comment.objects.count(),
+        },
+        'results': results,
+    }
+
+
+def compare(old, new):
+    """Строки сравнения p50 и числа запросов с прошлым прогоном."""
+    for name, current in new['results'].items():
+        previous = old['results'].get(name)
+        if previous is None:
+            continue
+        change = (current['p50_ms'] - previous['p50_ms']) / max(
+            previous['p50_ms'], 0.001) * 100
+        yield (f'{name:<20} p50 {previous["p50_ms"]:>9.2f} -> '
+               f'{current["p50_ms"]:>9.2f} ms ({change:+.1f}%)  '
+               f'queries {previous["queries"]} -> {current["queries"]}')
+
+
+def _orm_mutual(user_id):
+    followers = Follow.objects.filter(author_id=user_id).values('user_id')
+    return sorted(Follow.objects.filter(
+        user_id=user_id, author_id__in=followers).values_list(
+        'author_id', flat=True))
+
+
+def _orm_suggestions(user_id, limit=10):
+    followees = Follow.objects.filter(user_id=user_id).values('author_id')
+    return list(Follow.objects.filter(user_id__in=followees).exclude(
+        author_id__in=followees).exclude(author_id=user_id).values(
+        'author_id').annotate(common=Count('pk')).order_by(
+        '-common', '-author__stats__followers_count').values_list(
+        'author_id', 'common')[:limit])
+
+
+GRAPH_QUERIES = {
+    'follower_count': (
+        lambda graph, pk: graph.follower_count(pk),
+        lambda pk: Follow.objects.filter(author_id=pk).count()),
+    'mutual': (
+        lambda graph, pk: graph.mutual(pk), _orm_mutual),
+    'suggestions': (
+        lambda graph, pk: graph.suggestions(pk), _orm_suggestions),
+}
+
+
+def _timed(function, user_ids):
+    timings = []
+    for pk in user_ids:
+        started = time.perf_counter()
+        function(pk)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+    }
+
+
+def follow_graph(samples, log=print):
+    """Время ответов графа в памяти и тех же запросов через ORM."""
+    started = time.perf_counter()
+    graph = FollowGraph.load()
+    load_ms = (time.perf_counter() - started) * 1000
+    edges = len(graph.out_targets)
+    if not edges:
+        raise ValueError('Сначала наполните базу: manage.py seed_posts')
+    log(f'loaded {edges} edges in {load_ms:.0f} ms')
+
+    readers = list(Follow.objects.values_list(
+        'user_id', flat=True).distinct()[:samples * 10])
+    user_ids = random.Random(0).sample(readers, min(samples, len(readers)))
+    results = {}
+    for name, (in_memory, orm) in GRAPH_QUERIES.items():
+        results[name] = {
+            'graph': _timed(partial(in_memory, graph), user_ids),
+            'orm': _timed(orm, user_ids),
+        }
+        log(f'{name:<15} graph {results[name]["graph"]}  '
+            f'orm {results[name]["orm"]}')
+    return {'edges': edges, 'load_ms': round(load_ms), 'samples': len(
+        user_ids), 'results': results}
+
+
+def api_targets():
+    """(имя, адрес API, пользователь) для страниц, у которых есть API."""
+    author, reader, group, post = _subjects()
+    pages = [
+        ('index', (), None),
+        ('group_list', (group.slug,), None),
+        ('profile', (author.username,), None),
+        ('follow_index', (), reader),
+        ('post_detail', (post.pk,), None),
+        ('post_comments', (post.pk,), None),
+    ]
+    for name, args, user in pages:
+        yield name, reverse(f'posts:api_{name}', args=args), user
+
+
+def _html_url(name, api_url):
+    """Страница HTML с теми же данными, что и адрес API."""
+    match = resolve(api_url)
+    if name == 'post_comments':
+        # комментарии на странице поста отдаёт отдельный адрес API
+        name = 'post_detail'
+    return reverse(f'posts:{name}', kwargs=match.kwargs)
+
+
+def api_vs_html(repeat, log=print):
+    """Те же данные страницей HTML, через API и через API со сжатием."""
+    results = {}
+    for name, api_url, user in api_targets():
+        html_url = _html_url(name, api_url)
+        results[name] = {
+            'html': measure(html_url, {}, user, repeat),
+            'api': measure(api_url, {}, user, repeat),
+            'api_gzip': measure(
+                api_url, {}, user, repeat, HTTP_ACCEPT_ENCODING='gzip'),
+        }
+        log(f'{name:<15} ' + '  '.join(
+            f'{kind} {result["p50_ms"]} ms {result["bytes"]} B'
+            for kind, result in results[name].items()))
+    return {
+        'revision': git_revision(),
+        'created': timezone.now().isoformat(),
+        'repeat': repeat,
+        'results': results,
+    }
@@ -0,0 +1,160 @@
+"""Условные GET для лент и страницы поста.
+
+ETag и Last-Modified считаются по штампам versions без рендера шаблона:
+неизменившаяся страница отдаётся ответом 304. Страница зависит и от
+пользователя (шапка, кнопка подписки, форма с CSRF-токеном), поэтому его
+id, ключ сессии и CSRF-cookie входят в ETag.
+
+Лента главной кэшируется в шаблоне на время и переживает новые посты.
+Для неё штамп INDEX замораживается на тот же срок и входит и в ETag, и в
+ключ фрагмента (index_version): иначе новый ETag подтверждал бы старое
+тело ответом 304.
+"""
+import asyncio
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from core.routers import replica_synced
+from django.conf import settings
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers, quote_etag)
+from django.utils.http import http_date
+
+from . import versions
+from .invalidation import EPOCH, HOT, INDEX
+from .models import Group, Post, User
+
+
+# сколько секунд главная показывает одну и ту же ленту
+INDEX_FROZEN_SECONDS = 20
+# фрагмент ленты живёт дольше заморозки: истёкши раньше, он собрался бы
+# из свежих данных под ещё замороженным ETag
+INDEX_FRAGMENT_SECONDS = 2 * INDEX_FROZEN_SECONDS
+
+
+def index_scopes(request):
+    return [INDEX]
+
+
+def _frozen_stamps(request, scopes, seconds):
+    return versions.frozen(scopes, request.get_full_path(), seconds)
+
+
+def index_version(request):
+    """Подпись ленты главной для ключа её фрагмента в шаблоне."""
+    stamps = _frozen_stamps(
+        request, index_scopes(request), INDEX_FROZEN_SECONDS)
+    return versions.signature([EPOCH], frozen=stamps)
+
+
+def hot_scopes(request):
+    return [HOT]
+
+
+def group_scopes(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    return None if group_id is None else [('group', group_id)]
+
+
+def profile_scopes(request, username):
+    user_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return None if user_id is None else [('author', user_id)]
+
+
+def post_scopes(request, post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id').first()
+    if row is None:
+        return None
+    author_id, group_id = row
+    scopes = [('post', post_id), ('author', author_id)]
+    if group_id:
+        scopes.append(('group', group_id))
+    return scopes
+
+
+def timeline_scopes(request):
+    return [('timeline', request.user.id)]
+
+
+def validators(get_scopes, freeze, request, *args, **kwargs):
+    """(etag, last_modified) или None, если страницы нет (будет 404)."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    scopes = get_scopes(request, *args, **kwargs)
+    if scopes is None:
+        return None
+
+    if freeze:
+        stamps = _frozen_stamps(request, scopes, freeze)
+        scopes = []
+    else:
+        stamps = []
+    user_id = request.user.id
+    if user_id is not None:
+        scopes.append(('user', user_id))
+    scopes.append(EPOCH)
+    stamps = [*stamps, *versions.get_many(scopes)]
+    synced = replica_synced()
+    if synced is not None:
+        # страница с реплики меняется и после её синхронизации
+        stamps.append(synced[1])
+    # вход и выход меняют сессию и CSRF-токен, но не штампы: форма
+    # из закэшированной до этого страницы несла бы устаревший токен
+    session = getattr(request, 'session', None)
+    session_key = session.session_key if session is not None else None
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    raw = (f'{user_id}|{session_key}|{csrf}|{request.get_full_path()}|'
+           f'{stamps}|{synced}')
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    return etag, max(stamps) // 10 ** 9
+
+
+def _finish(response, etag, last_modified):
+    if response.status_code not in (200, 304):
+        return response
+    response.headers.setdefault('ETag', etag)
+    if not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(last_modified)
+    # ответ разный для разных сессий и должен перепроверяться каждый раз
+    patch_vary_headers(response, ('Cookie',))
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional(get_scopes, freeze=None):
+    """Декоратор для обычных и асинхронных представлений.
+
+    get_scopes(request, *args, **kwargs) возвращает области versions,
+    от которых зависит страница, или None, если объекта нет. freeze —
+    на сколько секунд замораживать их штампы, см. versions.frozen.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                checked = await sync_to_async(validators)(
+                    get_scopes, freeze, request, *args, **kwargs)
+                if checked is None:
+                    return await view(request, *args, **kwargs)
+                response = get_conditional_response(request, *checked)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finish(response, *checked)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            checked = validators(
+                get_scopes, freeze, request, *args, **kwargs)
+            if checked is None:
+                return view(request, *args, **kwargs)
+            response = get_conditional_response(request, *checked)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _finish(response, *checked)
+        return wrapper
+    return decorator
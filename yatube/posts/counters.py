@@ -0,0 +1,92 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+
+def _count(queryset, field):
+    """Подзапрос COUNT(*) по полю field для коррелированных UPDATE."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('pk')).values('count')), 0)
+
+
+def create_author(user_id):
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id)], ignore_conflicts=True)
+
+
+def ensure_author(user_id):
+    """Создаёт строку счётчиков автора сразу с актуальными значениями."""
+    create_author(user_id)
+    AuthorStats.objects.filter(user_id=user_id).update(
+        posts_count=Post.objects.filter(author_id=user_id).count(),
+        followers_count=Follow.objects.filter(author_id=user_id).count())
+
+
+def author_stats(user):
+    """Счётчики автора; строка создаётся, если её ещё нет."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        ensure_author(user.pk)
+        return AuthorStats.objects.get(user_id=user.pk)
+
+
+def add_to_author(user_id, field, delta):
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    if not stats.update(**{field: F(field) + delta}) and delta > 0:
+        ensure_author(user_id)
+
+
+def add_to_post(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def reconcile_authors(user_ids=None):
+    """Пересчитывает счётчики авторов (None — всех), возвращает число
+    исправленных."""
+    users = User.objects.all()
+    stats = AuthorStats.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+        stats = stats.filter(user_id__in=user_ids)
+    AuthorStats.objects.bulk_create(
+        (AuthorStats(user_id=pk)
+         for pk in users.values_list('pk', flat=True).iterator()),
+        batch_size=1000,
+        ignore_conflicts=True)
+
+    fixed = users.annotate(
+        real_posts=_count(Post.objects.all(), 'author'),
+        real_followers=_count(Follow.objects.all(), 'author')
+    ).exclude(
+        stats__posts_count=F('real_posts'),
+        stats__followers_count=F('real_followers')
+    ).count()
+    stats.update(
+        posts_count=_count(Post.objects.all(), 'author'),
+        followers_count=_count(Follow.objects.all(), 'author'))
+    return fixed
+
+
+def reconcile_posts(post_ids=None):
+    """Пересчитывает число комментариев постов (None — всех)."""
+    posts = Post.objects.all()
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+    comments = _count(Comment.objects.all(), 'post')
+    fixed = posts.annotate(real_comments=comments).exclude(
+        comments_count=F('real_comments')).count()
+    posts.update(comments_count=comments)
+    return fixed
+
+
+def reconcile():
+    """Пересчитывает все счётчики, возвращает число исправленных строк."""
+    return reconcile_authors() + reconcile_posts()
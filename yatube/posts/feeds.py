@@ -0,0 +1,184 @@
+"""Ленты RSS, Atom и JSON Feed для главной, групп и авторов.
+
+Посты читаются через .iterator() только нужными столбцами, ответ
+отдаётся потоком. Готовое тело кэшируется под ключом со штампом области:
+новый пост в ленте меняет ключ, и следующая выдача собирается заново.
+"""
+import json
+from xml.sax.saxutils import escape
+
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.text import Truncator
+
+from . import versions
+from .conditional import (conditional, group_scopes, index_scopes,
+                          profile_scopes)
+from .invalidation import EPOCH, INDEX
+from .models import Group, Post, User
+
+FEED_SIZE = 20
+FEED_TIMEOUT = 60 * 10
+
+CONTENT_TYPES = {
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+COLUMNS = ('pk', 'text', 'pub_date', 'author__username',
+           'author__first_name', 'author__last_name')
+
+
+class Channel:
+    """Заголовок ленты, её адреса и выборка постов."""
+
+    def __init__(self, request, title, link, feed_link, posts):
+        self.title = title
+        self.link = request.build_absolute_uri(link)
+        self.feed_link = request.build_absolute_uri(feed_link)
+        self.posts = posts
+        self.build_absolute_uri = request.build_absolute_uri
+
+    def items(self):
+        rows = self.posts.order_by('-pub_date', '-pk').values_list(
+            *COLUMNS)[:FEED_SIZE]
+        for pk, text, pub_date, username, first, last in rows.iterator(
+                chunk_size=FEED_SIZE):
+            yield {
+                'link': self.build_absolute_uri(
+                    reverse('posts:post_detail', args=[pk])),
+                'title': Truncator(text).words(8),
+                'text': text,
+                'pub_date': pub_date,
+                'author': f'{first} {last}'.strip() or username,
+            }
+
+
+def _rss(channel):
+    yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<rss version="2.0"><channel>'
+           f'<title>{escape(channel.title)}</title>'
+           f'<link>{escape(channel.link)}</link>'
+           f'<description>{escape(channel.title)}</description>'
+           '<language>ru</language>')
+    for item in channel.items():
+        yield ('<item>'
+               f'<title>{escape(item["title"])}</title>'
+               f'<link>{escape(item["link"])}</link>'
+               f'<guid>{escape(item["link"])}</guid>'
+               f'<description>{escape(item["text"])}</description>'
+               f'<author>{escape(item["author"])}</author>'
+               f'<pubDate>{rfc2822_date(item["pub_date"])}</pubDate>'
+               '</item>')
+    yield '</channel></rss>\n'
+
+
+def _atom(channel):
+    items = channel.items()
+    first = next(items, None)
+    # <updated> ленты — время самого свежего поста
+    updated = first['pub_date'] if first else None
+    yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="ru">'
+           f'<title>{escape(channel.title)}</title>'
+           f'<link href="{escape(channel.link)}" rel="alternate"/>'
+           f'<link href="{escape(channel.feed_link)}" rel="self"/>'
+           f'<id>{escape(channel.feed_link)}</id>'
+           f'<updated>{rfc3339_date(updated) if updated else ""}</updated>')
+    if first is None:
+        yield '</feed>\n'
+        return
+    for item in (first, *items):
+        yield ('<entry>'
+               f'<title>{escape(item["title"])}</title>'
+               f'<link href="{escape(item["link"])}" rel="alternate"/>'
+               f'<id>{escape(item["link"])}</id>'
+               f'<updated>{rfc3339_date(item["pub_date"])}</updated>'
+               f'<author><name>{escape(item["author"])}</name></author>'
+               f'<summary>{escape(item["text"])}</summary>'
+               '</entry>')
+    yield '</feed>\n'
+
+
+def _json(channel):
+    yield json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': channel.title,
+        'home_page_url': channel.link,
+        'feed_url': channel.feed_link,
+        'language': 'ru',
+    }, ensure_ascii=False)[:-1] + ', "items": ['
+    for number, item in enumerate(channel.items()):
+        yield (', ' if number else '') + json.dumps({
+            'id': item['link'],
+            'url': item['link'],
+            'title': item['title'],
+            'content_text': item['text'],
+            'date_published': rfc3339_date(item['pub_date']),
+            'authors': [{'name': item['author']}],
+        }, ensure_ascii=False)
+    yield ']}\n'
+
+
+WRITERS = {'rss': _rss, 'atom': _atom, 'json': _json}
+
+
+def _cached_stream(key, chunks):
+    """Отдаёт куски и кэширует тело, если его дочитали до конца."""
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    cache.add(key, ''.join(body), FEED_TIMEOUT)
+
+
+def feed_response(channel, scope, fmt):
+    if fmt not in WRITERS:
+        raise Http404(f'Неизвестный формат ленты: {fmt}')
+    key = 'posts:feed:{}:{}:{}:{}:{}'.format(
+        *scope, fmt, channel.feed_link, versions.signature([EPOCH, scope]))
+
+    body = cache.get(key)
+    if body is not None:
+        return HttpResponse(body, content_type=CONTENT_TYPES[fmt])
+    return StreamingHttpResponse(
+        _cached_stream(key, WRITERS[fmt](channel)),
+        content_type=CONTENT_TYPES[fmt])
+
+
+def _without_format(get_scopes):
+    """Области страницы ленты: формат на них не влияет."""
+    def scopes(request, fmt, **kwargs):
+        return get_scopes(request, **kwargs)
+    return scopes
+
+
+@conditional(_without_format(index_scopes))
+def index_feed(request, fmt):
+    channel = Channel(
+        request, 'Последние обновления на сайте', reverse('posts:index'),
+        request.path, Post.objects.all())
+    return feed_response(channel, INDEX, fmt)
+
+
+@conditional(_without_format(group_scopes))
+def group_feed(request, slug, fmt):
+    group = get_object_or_404(Group, slug=slug)
+    channel = Channel(
+        request, f'Записи сообщества {group.title}',
+        reverse('posts:group_list', args=[slug]), request.path,
+        Post.objects.filter(group=group))
+    return feed_response(channel, ('group', group.pk), fmt)
+
+
+@conditional(_without_format(profile_scopes))
+def profile_feed(request, username, fmt):
+    author = get_object_or_404(User, username=username)
+    channel = Channel(
+        request, f'Записи {author.get_full_name() or author.username}',
+        reverse('posts:profile', args=[username]), request.path,
+        Post.objects.filter(author=author))
+    return feed_response(channel, ('author', author.pk), fmt)
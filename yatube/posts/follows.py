@@ -0,0 +1,61 @@
+"""На кого подписан пользователь: одним запросом для любого числа авторов.
+
+Множество id авторов хранится в кэше отсортированным array('l') под ключом
+со штампом области ('following', id читателя); штамп меняют сигналы Follow,
+то есть и profile_follow, и profile_unfollow. На время запроса массив
+разворачивается в frozenset, и проверка автора занимает O(1).
+"""
+from array import array
+from functools import cached_property
+
+from django.core.cache import cache
+
+from . import versions
+from .invalidation import EPOCH
+from .models import Follow
+
+FOLLOWING_TIMEOUT = 60 * 60
+
+
+def followee_ids(user_id):
+    """Отсортированный array('l') id авторов, на которых подписан user_id."""
+    key = 'posts:following:{}:{}'.format(
+        user_id, versions.signature([EPOCH, ('following', user_id)]))
+    packed = cache.get(key)
+    ids = array('l')
+    if packed is not None:
+        ids.frombytes(packed)
+        return ids
+
+    ids.extend(Follow.objects.filter(user_id=user_id).order_by(
+        'author_id').values_list('author_id', flat=True))
+    cache.add(key, ids.tobytes(), FOLLOWING_TIMEOUT)
+    return ids
+
+
+class FollowState:
+    """Подписки читателя; user_id=None — аноним, он ни на кого не подписан."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+    @cached_property
+    def ids(self):
+        if self.user_id is None:
+            return frozenset()
+        return frozenset(followee_ids(self.user_id))
+
+    def follows(self, author_id):
+        return author_id in self.ids
+
+    def following(self, author_ids):
+        """{id автора: подписан ли читатель} для пачки авторов."""
+        return {author_id: author_id in self.ids for author_id in author_ids}
+
+
+def for_request(request):
+    """FollowState текущего пользователя, один на запрос."""
+    state = getattr(request, '_follow_state', None)
+    if state is None:
+        state = request._follow_state = FollowState(request.user.id)
+    return state
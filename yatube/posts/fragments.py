@@ -0,0 +1,40 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from . import versions
+from .invalidation import EPOCH
+
+CARD_TEMPLATE = 'includes/article.html'
+CARD_TIMEOUT = 60 * 60 * 24
+
+stats = Counter(hit=0, miss=0)
+
+
+def card_key(post):
+    scopes = [EPOCH, ('post', post.pk), ('user', post.author_id)]
+    if post.group_id:
+        scopes.append(('group', post.group_id))
+    return f'posts:card:{post.pk}:{versions.signature(scopes)}'
+
+
+def render_card(post):
+    key = card_key(post)
+    html = cache.get(key)
+    if html is not None:
+        stats['hit'] += 1
+        return html
+
+    stats['miss'] += 1
+    html = render_to_string(CARD_TEMPLATE, {'post': post})
+    # ключ содержит версию: запись не меняется, только появляется
+    cache.add(key, html, CARD_TIMEOUT)
+    return html
+
+
+def collect_metrics(registry):
+    cards = registry.counter(
+        'yatube_post_card_cache_total', 'Post card fragment cache lookups.')
+    for result, count in stats.items():
+        cards.set(count, result=result)
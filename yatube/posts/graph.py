@@ -0,0 +1,300 @@
+"""Граф подписок в памяти процесса.
+
+Рёбра Follow хранятся в двух CSR-структурах из array('l'): для
+пользователя u его подписки — out_targets[out_offsets[u]:out_offsets[u + 1]],
+подписчики автора — так же по in_*. Строки отсортированы, id пользователя —
+сразу индекс, поэтому соседи узла берутся срезом без запросов к базе.
+
+CSR не меняется после сборки; подписки и отписки копятся в наборах
+добавленных и удалённых рёбер поверх него и сливаются в новый CSR, когда их
+становится больше COMPACT_LIMIT. Между процессами изменения идут через
+журнал в кэше: сигналы Follow дописывают в него после коммита, а get_graph()
+перед ответом проигрывает новые записи. Если журнал потерян, переполнен или
+сменилась EPOCH, граф собирается из базы заново.
+
+Граф, который вернул get_graph(), больше не меняется: записи журнала
+проигрываются на копии (CSR общий, копируются только наборы изменений), и
+потоки могут читать его без блокировки.
+
+Журнал ведётся, только если POSTS_FOLLOW_GRAPH включён: каждая запись в
+общий кэш сбрасывает локальный уровень TwoTierCache во всех процессах, и
+без читателей графа это чистый расход. Без журнала граф не догнать, поэтому
+выключенный get_graph() бросает ImproperlyConfigured.
+"""
+import bisect
+import heapq
+import itertools
+import threading
+from array import array
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from . import versions
+from .invalidation import EPOCH
+from .models import Follow
+
+COMPACT_LIMIT = 10000
+# сколько изменений журнала проигрывать, прежде чем собрать граф заново
+JOURNAL_LIMIT = 5000
+JOURNAL_TIMEOUT = 60 * 60
+# у скольких подписок собирать кандидатов в рекомендации: ограничивает
+# работу для тех, кто читает тысячи авторов
+SUGGEST_FANOUT = 200
+
+SEQ_KEY = 'posts:graph:seq'
+FOLLOW = 'follow'
+UNFOLLOW = 'unfollow'
+RESET = 'reset'
+
+_graph = None
+_lock = threading.Lock()
+
+
+def _change_key(number):
+    return f'posts:graph:change:{number}'
+
+
+def _csr(sources, targets, size):
+    """(offsets, targets), сгруппированные по sources подсчётом."""
+    offsets = array('l', [0]) * (size + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    offsets = array('l', itertools.accumulate(offsets))
+    position = array('l', offsets)
+    grouped = array('l', [0]) * len(targets)
+    for source, target in zip(sources, targets):
+        grouped[position[source]] = target
+        position[source] += 1
+    return offsets, grouped
+
+
+class FollowGraph:
+    def __init__(self, users, authors, seq=0, epoch=None):
+        """users[i] подписан на authors[i]; пары отсортированы по users."""
+        size = max(max(users, default=0), max(authors, default=0)) + 1
+        self.out_offsets, self.out_targets = _csr(users, authors, size)
+        # users отсортированы, так что и строки in_* выходят отсортированными
+        self.in_offsets, self.in_targets = _csr(authors, users, size)
+        self.added_out = defaultdict(set)
+        self.added_in = defaultdict(set)
+        self.removed_out = defaultdict(set)
+        self.removed_in = defaultdict(set)
+        self.changes = 0
+        self.seq = seq
+        self.epoch = epoch
+
+    @classmethod
+    def load(cls, seq=0, epoch=None):
+        users, authors = array('l'), array('l')
+        rows = Follow.objects.order_by('user_id', 'author_id').values_list(
+            'user_id', 'author_id')
+        for user_id, author_id in rows.iterator(chunk_size=10000):
+            users.append(user_id)
+            authors.append(author_id)
+        return cls(users, authors, seq, epoch)
+
+    def copy(self):
+        """Копия с общим CSR: изменения копии не видны исходному графу."""
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        for name in ('added_out', 'added_in', 'removed_out', 'removed_in'):
+            setattr(clone, name, defaultdict(set, {
+                node: set(others)
+                for node, others in getattr(self, name).items()}))
+        return clone
+
+    # чтение
+
+    @staticmethod
+    def _row(offsets, targets, node):
+        if node + 1 >= len(offsets):
+            return targets[0:0]
+        return targets[offsets[node]:offsets[node + 1]]
+
+    def _has_base(self, user_id, author_id):
+        row = self._row(self.out_offsets, self.out_targets, user_id)
+        index = bisect.bisect_left(row, author_id)
+        return index < len(row) and row[index] == author_id
+
+    def _neighbours(self, offsets, targets, added, removed, node):
+        row = self._row(offsets, targets, node)
+        if node not in added and node not in removed:
+            return row
+        gone = removed.get(node, ())
+        return array('l', sorted([
+            *(other for other in row if other not in gone),
+            *added.get(node, ())]))
+
+    def followees(self, user_id):
+        return self._neighbours(
+            self.out_offsets, self.out_targets, self.added_out,
+            self.removed_out, user_id)
+
+    def followers(self, author_id):
+        return self._neighbours(
+            self.in_offsets, self.in_targets, self.added_in,
+            self.removed_in, author_id)
+
+    def follows(self, user_id, author_id):
+        if author_id in self.added_out.get(user_id, ()):
+            return True
+        if author_id in self.removed_out.get(user_id, ()):
+            return False
+        return self._has_base(user_id, author_id)
+
+    def follower_count(self, author_id):
+        row = self._row(self.in_offsets, self.in_targets, author_id)
+        return (len(row) + len(self.added_in.get(author_id, ()))
+                - len(self.removed_in.get(author_id, ())))
+
+    def followee_count(self, user_id):
+        row = self._row(self.out_offsets, self.out_targets, user_id)
+        return (len(row) + len(self.added_out.get(user_id, ()))
+                - len(self.removed_out.get(user_id, ())))
+
+    def mutual(self, user_id):
+        """Авторы, с которыми user_id подписан друг на друга."""
+        return sorted(
+            set(self.followees(user_id)).intersection(
+                self.followers(user_id)))
+
+    def suggestions(self, user_id, limit=10):
+        """Кого читают те, кого читает user_id: [(id, общих подписок)].
+
+        При равном числе общих подписок выше авторы с большим числом
+        подписчиков.
+        """
+        followees = self.followees(user_id)
+        known = set(followees)
+        known.add(user_id)
+        candidates = Counter()
+        for followee in followees[:SUGGEST_FANOUT]:
+            candidates.update(self.followees(followee))
+        return heapq.nlargest(
+            limit,
+            ((author, count) for author, count in candidates.items()
+             if author not in known),
+            key=lambda item: (item[1], self.follower_count(item[0])))
+
+    # изменения
+
+    def follow(self, user_id, author_id):
+        if self.follows(user_id, author_id):
+            return
+        if author_id in self.removed_out.get(user_id, ()):
+            self._discard(self.removed_out, user_id, author_id)
+            self._discard(self.removed_in, author_id, user_id)
+        else:
+            self.added_out[user_id].add(author_id)
+            self.added_in[author_id].add(user_id)
+        self._changed()
+
+    def unfollow(self, user_id, author_id):
+        if not self.follows(user_id, author_id):
+            return
+        if author_id in self.added_out.get(user_id, ()):
+            self._discard(self.added_out, user_id, author_id)
+            self._discard(self.added_in, author_id, user_id)
+        else:
+            self.removed_out[user_id].add(author_id)
+            self.removed_in[author_id].add(user_id)
+        self._changed()
+
+    @staticmethod
+    def _discard(sets, node, other):
+        sets[node].discard(other)
+        if not sets[node]:
+            del sets[node]
+
+    def _changed(self):
+        self.changes += 1
+        if self.changes > COMPACT_LIMIT:
+            self.compact()
+
+    def compact(self):
+        """Сливает накопленные изменения в новый CSR."""
+        users, authors = array('l'), array('l')
+        for user_id in range(len(self.out_offsets) - 1):
+            for author_id in self.followees(user_id):
+                users.append(user_id)
+                authors.append(author_id)
+        for user_id in sorted(
+                key for key in self.added_out
+                if key >= len(self.out_offsets) - 1):
+            for author_id in self.followees(user_id):
+                users.append(user_id)
+                authors.append(author_id)
+        self.__init__(users, authors, self.seq, self.epoch)
+
+    def apply(self, changes):
+        """Проигрывает записи журнала; False — граф нужно собрать заново."""
+        for operation, user_id, author_id in changes:
+            if operation == FOLLOW:
+                self.follow(user_id, author_id)
+            elif operation == UNFOLLOW:
+                self.unfollow(user_id, author_id)
+            else:
+                return False
+        return True
+
+
+def record(*changes):
+    """Дописывает в журнал (операция, user_id, author_id)."""
+    try:
+        last = cache.incr(SEQ_KEY, len(changes))
+    except ValueError:
+        cache.add(SEQ_KEY, 0, None)
+        last = cache.incr(SEQ_KEY, len(changes))
+    first = last - len(changes) + 1
+    cache.set_many({
+        _change_key(first + number): change
+        for number, change in enumerate(changes)}, JOURNAL_TIMEOUT)
+
+
+def journal(change):
+    """Запишет изменение в журнал после коммита, если граф включён."""
+    if settings.POSTS_FOLLOW_GRAPH:
+        transaction.on_commit(partial(record, change))
+
+
+def _replay(graph):
+    """Граф, догнанный до журнала, или None — нужно собрать заново."""
+    seq = cache.get(SEQ_KEY, 0)
+    if seq < graph.seq or seq - graph.seq > JOURNAL_LIMIT:
+        return None
+    if seq == graph.seq:
+        return graph
+    keys = [_change_key(number) for number in range(graph.seq + 1, seq + 1)]
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        return None
+    # уже выданный граф могут читать другие потоки: меняем копию
+    graph = graph.copy()
+    if not graph.apply(found[key] for key in keys):
+        return None
+    graph.seq = seq
+    return graph
+
+
+def get_graph():
+    """Граф процесса, догнанный до последней записи журнала."""
+    global _graph
+    if not settings.POSTS_FOLLOW_GRAPH:
+        raise ImproperlyConfigured(
+            'Граф подписок требует POSTS_FOLLOW_GRAPH = True')
+    with _lock:
+        epoch, = versions.get_many([EPOCH])
+        graph = None
+        if _graph is not None and _graph.epoch == epoch:
+            graph = _replay(_graph)
+        if graph is None:
+            # всё, что попадёт в журнал во время загрузки, проиграется
+            # поверх: подписка и отписка идемпотентны
+            graph = FollowGraph.load(cache.get(SEQ_KEY, 0), epoch)
+        _graph = graph
+        return graph
@@ -0,0 +1,114 @@
+"""Какие области versions затрагивает изменение данных posts.
+
+Функции вызываются получателями post_save, post_delete и rows_updated
+(QuerySet.update сам сигналов Django не шлёт). QuerySet.delete отдельной
+обработки не требует: пока у модели есть получатели post_delete, Django
+рассылает его для каждой удаляемой строки.
+
+Области: INDEX — главная лента, HOT — рейтинги posts.trending, ('group',
+id) — лента группы, ('author', id) — профиль, ('post', id) — страница
+поста, ('timeline', id) — лента подписок пользователя, ('following', id) —
+на кого он подписан, ('user', id) — его имя в карточках. EPOCH входит
+во все ключи и меняется, когда затронутое не перечислить.
+"""
+from . import versions
+from .models import AuthorStats, Comment, Follow, Group, Post
+
+INDEX = ('index', 0)
+HOT = ('hot', 0)
+EPOCH = ('epoch', 0)
+
+
+def _timelines(author_ids):
+    followers = Follow.objects.filter(author_id__in=author_ids).values_list(
+        'user_id', flat=True).distinct()
+    return [('timeline', user_id) for user_id in followers]
+
+
+def post_scopes(post_ids, author_ids, group_ids):
+    author_ids = set(author_ids)
+    scopes = [INDEX, HOT, *(('post', pk) for pk in post_ids)]
+    scopes.extend(('author', pk) for pk in author_ids)
+    scopes.extend(('group', pk) for pk in set(group_ids) if pk)
+    scopes.extend(_timelines(author_ids))
+    return scopes
+
+
+def comment_scopes(post_ids):
+    return [HOT, *(('post', pk) for pk in set(post_ids))]
+
+
+def follow_scopes(pairs):
+    scopes = []
+    for user_id, author_id in pairs:
+        scopes += [('author', author_id), ('timeline', user_id),
+                   ('following', user_id)]
+    return scopes
+
+
+def group_scopes(group_ids):
+    authors = Post.objects.filter(group_id__in=group_ids).values_list(
+        'author_id', flat=True).distinct()
+    return [INDEX, HOT, *(('group', pk) for pk in group_ids),
+            *_timelines(authors)]
+
+
+def user_scopes(user_ids):
+    """Имя автора есть в карточках его постов и в его комментариях."""
+    group_ids = Post.objects.filter(
+        author_id__in=user_ids, group__isnull=False).values_list(
+        'group_id', flat=True).distinct()
+    commented = Comment.objects.filter(author_id__in=user_ids).values_list(
+        'post_id', flat=True).distinct()
+    scopes = [INDEX, *(('group', pk) for pk in group_ids)]
+    for user_id in user_ids:
+        scopes += [('user', user_id), ('author', user_id)]
+    scopes.extend(comment_scopes(commented))
+    scopes.extend(_timelines(user_ids))
+    return scopes
+
+
+def invalidate(scopes):
+    if scopes:
+        versions.bump(*set(scopes))
+
+
+def _refetched(model, rows, fields):
+    """Значения внешних ключей после update(), если он их менял."""
+    relations = {
+        field.name for field in model._meta.concrete_fields
+        if field.is_relation}
+    relations |= {f'{name}_id' for name in relations}
+    if not fields & relations:
+        return []
+    return list(model.objects.filter(
+        pk__in=[row['pk'] for row in rows]).values(*rows[0]))
+
+
+def rows_changed(model, rows, fields):
+    """Получатель rows_updated: rows — строки до изменения или None."""
+    if rows is None:
+        invalidate([EPOCH])
+        return
+
+    rows = rows + _refetched(model, rows, fields)
+    if model is Post:
+        if fields <= {'comments_count'}:
+            scopes = comment_scopes(row['pk'] for row in rows)
+        else:
+            scopes = post_scopes(
+                {row['pk'] for row in rows},
+                (row['author_id'] for row in rows),
+                (row['group_id'] for row in rows))
+    elif model is Comment:
+        scopes = comment_scopes(row['post_id'] for row in rows)
+    elif model is Follow:
+        scopes = follow_scopes(
+            (row['user_id'], row['author_id']) for row in rows)
+    elif model is Group:
+        scopes = group_scopes([row['pk'] for row in rows])
+    elif model is AuthorStats:
+        scopes = [('author', row['user_id']) for row in rows]
+    else:
+        scopes = [EPOCH]
+    invalidate(scopes)
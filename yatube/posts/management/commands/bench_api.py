@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает JSON API со страницами HTML на тех же данных: '
+            'время ответа, число запросов и размер тела')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз запросить каждый адрес')
+        parser.add_argument(
+            '--output', help='Куда записать результаты в JSON')
+
+    def handle(self, *args, **options):
+        try:
+            report = benchmarks.api_vs_html(
+                options['repeat'], log=self.stdout.write)
+        except ValueError as error:
+            raise CommandError(error)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты записаны в {options["output"]}'))
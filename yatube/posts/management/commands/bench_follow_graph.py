@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает граф подписок в памяти с теми же запросами через '
+            'ORM: число подписчиков, взаимные подписки, рекомендации')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--samples', type=int, default=200,
+            help='Сколько случайных читателей опросить')
+        parser.add_argument(
+            '--output', help='Куда записать результаты в JSON')
+
+    def handle(self, *args, **options):
+        try:
+            report = benchmarks.follow_graph(
+                options['samples'], log=self.stdout.write)
+        except ValueError as error:
+            raise CommandError(error)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты записаны в {options["output"]}'))
@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Замеряет перцентили времени ответа и число SQL-запросов '
+            'для страниц posts на разной глубине пагинации')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--depths', default='1,10,100',
+            help='Номера страниц лент через запятую')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--output', help='Куда записать результаты в JSON')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        depths = [int(depth) for depth in options['depths'].split(',')]
+        try:
+            report = benchmarks.run(
+                depths, options['repeat'], log=self.stdout.write)
+        except ValueError as error:
+            raise CommandError(error)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты записаны в {options["output"]}'))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)
+            for line in benchmarks.compare(previous, report):
+                self.stdout.write(line)
@@ -0,0 +1,51 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает пользователей, группы, посты, комментарии и подписки'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл выгрузки, по умолчанию stdout')
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'),
+            help='По умолчанию определяется по расширению файла')
+        parser.add_argument(
+            '--kind', action='append', choices=transfer.KINDS,
+            help='Виды записей; для CSV ровно один')
+        parser.add_argument(
+            '--chunk-size', type=int, default=transfer.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['output']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson')
+        kinds = options['kind'] or transfer.KINDS
+        if file_format == 'csv' and len(kinds) != 1:
+            raise CommandError('CSV хранит один вид записей: укажите --kind')
+
+        started = time.monotonic()
+        file = sys.stdout if path == '-' else open(
+            path, 'w', encoding='utf-8', newline='')
+        try:
+            if file_format == 'csv':
+                count = transfer.export_csv(
+                    file, kinds[0], options['chunk_size'])
+            else:
+                count = transfer.export_ndjson(
+                    file, kinds, options['chunk_size'])
+        finally:
+            if file is not sys.stdout:
+                file.close()
+
+        elapsed = time.monotonic() - started
+        # при выгрузке в stdout отчёт не должен попасть в данные
+        self.stderr.write(
+            f'{count} строк за {elapsed:.1f}s, '
+            f'{count / max(elapsed, 1e-9):.0f} строк/с')
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import ImageJob, Post
+
+
+class Command(BaseCommand):
+    help = 'Заранее рисует миниатюры для уже загруженных картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перерисовать и картинки, у которых уже есть заявка, '
+                 'например после изменения POSTS_THUMBNAILS')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        queued = set()
+        if not options['force']:
+            # упавшие заявки повторяет process_image_jobs --retry-failed
+            queued.update(ImageJob.objects.filter(
+                kind=ImageJob.RENDER).values_list('image', flat=True))
+        jobs = {}
+        posts = Post.objects.exclude(image='').order_by('pk').values_list(
+            'pk', 'image')
+        for post_id, name in posts.iterator():
+            if name in queued:
+                continue
+            # одна заявка на файл, даже если его показывают несколько постов
+            jobs.setdefault(name, ImageJob(
+                kind=ImageJob.RENDER, image=name, post_id=post_id))
+        created = ImageJob.objects.bulk_create(jobs.values(), batch_size=500)
+        done, failed = thumbnails.run_jobs([job.pk for job in created])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {done}, с ошибкой: {failed} '
+            f'за {time.monotonic() - start:.1f} с'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Загружает выгрузку export_posts пачками в транзакциях'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON или CSV')
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'),
+            help='По умолчанию определяется по расширению файла')
+        parser.add_argument(
+            '--kind', choices=transfer.KINDS,
+            help='Вид записей в CSV-файле')
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE)
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересобирать ленты, счётчики и поисковый индекс')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson')
+        if file_format == 'csv' and not options['kind']:
+            raise CommandError('Для CSV укажите --kind')
+
+        with open(path, encoding='utf-8', newline='') as file:
+            if file_format == 'csv':
+                records = transfer.read_csv(file, options['kind'])
+            else:
+                records = transfer.read_ndjson(file)
+            try:
+                transfer.load(
+                    records,
+                    batch_size=options['batch_size'],
+                    derived=not options['skip_derived'],
+                    log=self.stdout.write)
+            except (ValueError, KeyError) as error:
+                raise CommandError(f'Ошибка в данных: {error!r}')
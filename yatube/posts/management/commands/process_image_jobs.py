@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import thumbnails
+from posts.models import ImageJob
+
+
+class Command(BaseCommand):
+    help = ('Выполняет заявки очереди картинок, оставшиеся после '
+            'перезапуска, и чистит выполненные')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale', type=int, default=600,
+            help='Через сколько секунд заявка в работе считается брошенной')
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Повторить заявки, завершившиеся ошибкой')
+        parser.add_argument(
+            '--keep-days', type=int, default=7,
+            help='Сколько дней хранить выполненные заявки')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        ImageJob.objects.filter(
+            status=ImageJob.RUNNING,
+            started__lt=now - timedelta(seconds=options['stale']),
+        ).update(status=ImageJob.PENDING)
+        if options['retry_failed']:
+            ImageJob.objects.filter(status=ImageJob.FAILED).update(
+                status=ImageJob.PENDING, error='')
+        pruned, _ = ImageJob.objects.filter(
+            status=ImageJob.DONE,
+            finished__lt=now - timedelta(days=options['keep_days']),
+        ).delete()
+
+        done, failed = thumbnails.run_jobs(ImageJob.objects.filter(
+            status=ImageJob.PENDING).values_list('pk', flat=True))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено заявок: {done}, с ошибкой: {failed}, '
+            f'удалено старых: {pruned}'))
@@ -0,0 +1,25 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает рейтинги горячих постов и активных групп по '
+            'событиям последних дней; запускать по расписанию')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=float,
+            default=trending.WINDOW.total_seconds() / 86400,
+            help='За сколько дней учитывать посты и комментарии')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        posts, groups = trending.refresh(
+            window=timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинги: постов {posts}, групп {groups} '
+            f'за {time.monotonic() - start:.1f} с'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Наполняет базу пользователями, постами и подписками для замеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя')
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного распределения авторов')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересобирать ленты, счётчики и поисковый индекс')
+
+    def handle(self, *args, **options):
+        benchmarks.seed(
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            follows=options['follows'],
+            comments=options['comments'],
+            alpha=options['alpha'],
+            derived=not options['skip_derived'],
+            seed_value=options['seed'],
+            log=self.stdout.write)
@@ -0,0 +1,64 @@
+# Generated by Django 4.1.5 on 2026-10-18 15:30
+
+from django.db import OperationalError, migrations, models
+import django.db.models.deletion
+
+
+def create_fts(apps, schema_editor):
+    # без FTS5 поиск работает на таблицах SearchTerm/SearchPosting
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_post_fts USING fts5(body)')
+    except OperationalError:
+        pass
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, unique=True, verbose_name='Терм')),
+                ('documents', models.PositiveIntegerField(default=0, verbose_name='Постов с термом')),
+            ],
+            options={
+                'verbose_name': 'Терм поиска',
+                'verbose_name_plural': 'Термы поиска',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.PositiveIntegerField(verbose_name='Частота терма')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.post', verbose_name='Пост')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='posts.searchterm', verbose_name='Терм')),
+            ],
+            options={
+                'verbose_name': 'Вхождение терма',
+                'verbose_name_plural': 'Вхождения термов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['post'], name='search_posting_post'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchposting',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_term_post'),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
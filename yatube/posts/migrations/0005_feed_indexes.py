@@ -0,0 +1,37 @@
+# Generated by Django 4.1.5 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_search'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='timeline',
+            options={'ordering': ['-pub_date', '-post_id'], 'verbose_name': 'Запись ленты', 'verbose_name_plural': 'Ленты подписок'},
+        ),
+        migrations.RemoveIndex(
+            model_name='timeline',
+            name='timeline_user_pub_date',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_pub_date'),
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_pub_date'),
+        ),
+    ]
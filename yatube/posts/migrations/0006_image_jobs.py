@@ -0,0 +1,37 @@
+# Generated by Django 4.1.5 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('render', 'Нарисовать миниатюры'), ('purge', 'Удалить миниатюры')], max_length=10, verbose_name='Действие')),
+                ('image', models.CharField(max_length=255, verbose_name='Файл картинки')),
+                ('post_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='Пост')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Состояние')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Поставлена')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='Начата')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+            ],
+            options={
+                'verbose_name': 'Заявка на обработку картинки',
+                'verbose_name_plural': 'Очередь обработки картинок',
+                'ordering': ['created', 'pk'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='imagejob',
+            index=models.Index(fields=['status', 'created'], name='image_job_status'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.1.5 on 2026-10-18 18:02
+
+from collections import Counter
+from itertools import islice
+
+from django.db import migrations
+
+from posts.search import DOCUMENTS, normalize
+
+FTS_TABLE = 'posts_post_fts'
+CHUNK_SIZE = 1000
+
+
+def fill_search_index(apps, schema_editor):
+    # 0004 создала пустой индекс: заполняем его постами, написанными до неё
+    connection = schema_editor.connection
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.only('pk', 'text').iterator(chunk_size=CHUNK_SIZE)
+
+    if (connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                ([post.pk, ' '.join(normalize(post.text))] for post in posts))
+        return
+
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    SearchPosting = apps.get_model('posts', 'SearchPosting')
+    SearchPosting.objects.all().delete()
+    SearchTerm.objects.all().delete()
+    documents = Counter()
+    indexed = 0
+    while chunk := list(islice(posts, CHUNK_SIZE)):
+        frequencies = {post.pk: Counter(normalize(post.text))
+                       for post in chunk}
+        words = set().union(*frequencies.values())
+        SearchTerm.objects.bulk_create(
+            [SearchTerm(term=term) for term in words],
+            ignore_conflicts=True)
+        term_ids = dict(SearchTerm.objects.filter(
+            term__in=words).values_list('term', 'pk'))
+        SearchPosting.objects.bulk_create(
+            SearchPosting(term_id=term_ids[term], post_id=post_id,
+                          weight=weight)
+            for post_id, counts in frequencies.items()
+            for term, weight in counts.items())
+        for counts in frequencies.values():
+            documents.update(counts.keys())
+            indexed += bool(counts)
+
+    terms = list(SearchTerm.objects.all())
+    for term in terms:
+        term.documents = documents[term.term]
+    SearchTerm.objects.bulk_update(terms, ['documents'], batch_size=500)
+    SearchTerm.objects.create(term=DOCUMENTS, documents=indexed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_scores'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -3,9 +3,50 @@ from core.slugify.slugify import slugify
 from django.contrib.auth import get_user_model
 from django.core.validators import MinLengthValidator
 from django.db import models
+from django.dispatch import Signal
 
 User = get_user_model()
 
+# QuerySet.update() не шлёт post_save. rows — значения pk и внешних ключей
+# строк до изменения или None, если строк больше UPDATE_ROWS_LIMIT;
+# fields — имена изменённых полей.
+rows_updated = Signal()
+UPDATE_ROWS_LIMIT = 1000
+
+
+class InvalidatingQuerySet(models.QuerySet):
+    """Сообщает об update() сигналом rows_updated."""
+
+    def update(self, **kwargs):
+        if not rows_updated.has_listeners(self.model):
+            return super().update(**kwargs)
+
+        tracked = ['pk'] + [
+            field.attname for field in self.model._meta.concrete_fields
+            if field.is_relation]
+        rows = list(self.values(*tracked)[:UPDATE_ROWS_LIMIT + 1])
+        count = super().update(**kwargs)
+        if rows:
+            rows_updated.send(
+                sender=self.model,
+                rows=rows if len(rows) <= UPDATE_ROWS_LIMIT else None,
+                fields=frozenset(kwargs))
+        return count
+
+
+class PostQuerySet(InvalidatingQuerySet):
+    def for_feed(self):
+        """Всё, что читает карточка поста в ленте, одним запросом."""
+        return self.select_related('author', 'group')
+
+    def for_detail(self):
+        """Пост с автором, группой и счётчиком постов автора.
+
+        Комментарии читаются отдельно страницами: views.comment_page.
+        """
+        return self.select_related('author', 'group').annotate(
+            author_posts_count=models.F('author__stats__posts_count'))
+
 
 class Post(models.Model):
     text = models.TextField(
@@ -37,11 +78,25 @@ class Post(models.Model):
         null=True,
         verbose_name='Группа',
         help_text='Группа, к которой будет относиться пост')
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев')
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date'),
+        ]
 
     def __str__(self):
         return f'{self.text[:15]}...' if len(self.text) > 15 else self.text
@@ -58,6 +113,8 @@ class Group(models.Model):
     description = models.TextField(
         verbose_name='Описание')
 
+    objects = InvalidatingQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Группа'
         verbose_name_plural = 'Группы'
@@ -90,6 +147,36 @@ class Comment(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True)
 
+    objects = InvalidatingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора, обновляются через F()."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор')
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов')
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков')
+
+    objects = InvalidatingQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -103,9 +190,200 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор комментария')
 
+    objects = InvalidatingQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'], name='unique_author_user_following'
             )
         ]
+
+
+class PostScore(models.Model):
+    """Рейтинг «горячего» поста, см. posts.trending."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Пост')
+    score = models.FloatField(
+        verbose_name='Рейтинг')
+
+    class Meta:
+        ordering = ['-score', '-post']
+        verbose_name = 'Рейтинг поста'
+        verbose_name_plural = 'Рейтинги постов'
+        indexes = [
+            models.Index(fields=['-score', '-post'], name='post_score'),
+        ]
+
+
+class GroupScore(models.Model):
+    """Рейтинг активности группы, см. posts.trending."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Группа')
+    score = models.FloatField(
+        verbose_name='Рейтинг')
+
+    class Meta:
+        ordering = ['-score', '-group']
+        verbose_name = 'Рейтинг группы'
+        verbose_name_plural = 'Рейтинги групп'
+        indexes = [
+            models.Index(fields=['-score', '-group'], name='group_score'),
+        ]
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок: строка на пару (читатель, пост)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пост')
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date'),
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_user_post'
+            )
+        ]
+
+
+class SearchTerm(models.Model):
+    term = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Терм')
+    documents = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов с термом')
+
+    class Meta:
+        verbose_name = 'Терм поиска'
+        verbose_name_plural = 'Термы поиска'
+
+    def __str__(self):
+        return self.term
+
+
+class SearchPosting(models.Model):
+    term = models.ForeignKey(
+        SearchTerm,
+        on_delete=models.CASCADE,
+        related_name='postings',
+        verbose_name='Терм')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост')
+    weight = models.PositiveIntegerField(
+        verbose_name='Частота терма')
+
+    class Meta:
+        verbose_name = 'Вхождение терма'
+        verbose_name_plural = 'Вхождения термов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'], name='unique_search_term_post'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['post'], name='search_posting_post'),
+        ]
+
+
+class ImageJob(models.Model):
+    """Заявка posts.thumbnails: нарисовать миниатюры или убрать старые."""
+    RENDER = 'render'
+    PURGE = 'purge'
+    KINDS = [
+        (RENDER, 'Нарисовать миниатюры'),
+        (PURGE, 'Удалить миниатюры'),
+    ]
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    kind = models.CharField(
+        max_length=10,
+        choices=KINDS,
+        verbose_name='Действие')
+    image = models.CharField(
+        max_length=255,
+        verbose_name='Файл картинки')
+    # не внешний ключ: уборка нужна и после удаления поста
+    post_id = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Пост')
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Состояние')
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток')
+    error = models.TextField(
+        blank=True,
+        verbose_name='Ошибка')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Поставлена')
+    started = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Начата')
+    finished = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Завершена')
+
+    class Meta:
+        ordering = ['created', 'pk']
+        verbose_name = 'Заявка на обработку картинки'
+        verbose_name_plural = 'Очередь обработки картинок'
+        indexes = [
+            models.Index(
+                fields=['status', 'created'], name='image_job_status'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.image} ({self.status})'
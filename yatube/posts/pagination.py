@@ -0,0 +1,157 @@
+import base64
+import binascii
+from collections.abc import Sequence
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from . import versions
+from .invalidation import EPOCH
+
+FORWARD = 'n'
+BACKWARD = 'p'
+COUNT_TIMEOUT = 60
+
+
+def encode_cursor(direction, key, pk):
+    """key — дата публикации или числовой рейтинг строки."""
+    value = key.isoformat() if isinstance(key, datetime) else repr(key)
+    raw = f'{direction}|{value}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_key(value):
+    # у даты в isoformat всегда есть время, у числа двоеточия нет
+    return datetime.fromisoformat(value) if ':' in value else float(value)
+
+
+def decode_cursor(token):
+    """decode_cursor(str) -> (direction, key, pk) or None"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, key, pk = raw.split('|')
+        if direction not in (FORWARD, BACKWARD):
+            return None
+        return direction, _decode_key(key), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class CursorPage(Sequence):
+    """Страница ленты без COUNT(*) и OFFSET: только соседние курсоры."""
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по (pub_date, id), порядок как у Post.Meta.
+
+    keys — имена полей ключа сортировки и id у объектов выборки, если они
+    называются иначе: например, ('pub_date', 'post_id') для строк Timeline
+    или ('score', 'post_id') для рейтинга PostScore.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'pk')):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.date_key, self.id_key = keys
+
+    def get_page(self, token):
+        position = decode_cursor(token) if token else None
+        if position is None:
+            return self._forward(self.object_list, first=True)
+
+        direction, pub_date, pk = position
+        lookup = 'lt' if direction == FORWARD else 'gt'
+        boundary = (
+            Q(**{f'{self.date_key}__{lookup}': pub_date})
+            | Q(**{self.date_key: pub_date, f'{self.id_key}__{lookup}': pk}))
+        if direction == FORWARD:
+            return self._forward(self.object_list.filter(boundary))
+        return self._backward(self.object_list.filter(boundary))
+
+    def _forward(self, queryset, first=False):
+        rows = list(queryset.order_by(
+            f'-{self.date_key}', f'-{self.id_key}')[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return self._page(rows, has_next, has_previous=not first)
+
+    def _backward(self, queryset):
+        rows = list(queryset.order_by(
+            self.date_key, self.id_key)[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return self._page(rows, has_next=True, has_previous=has_previous)
+
+    def _key(self, row):
+        return getattr(row, self.date_key), getattr(row, self.id_key)
+
+    def _page(self, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(FORWARD, *self._key(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor(BACKWARD, *self._key(rows[0]))
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+def ascending_page(queryset, token, per_page, keys=('created', 'pk')):
+    """Страница по возрастанию keys сразу за курсором token.
+
+    Продолжение подгружается только вперёд, поэтому у страницы есть лишь
+    next_cursor — ключ её последней строки.
+    """
+    key, id_key = keys
+    position = decode_cursor(token) if token else None
+    if position is not None and position[0] == FORWARD:
+        _, value, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{key}__gt': value})
+            | Q(**{key: value, f'{id_key}__gt': pk}))
+    rows = list(queryset.order_by(key, id_key)[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(
+            FORWARD, getattr(rows[-1], key), getattr(rows[-1], id_key))
+    return CursorPage(rows, next_cursor)
+
+
+def cached_count(queryset, scope, timeout=COUNT_TIMEOUT):
+    """COUNT(*) выборки области scope из versions.
+
+    Ключ содержит штамп области и меняется при любой записи в неё, TTL
+    ограничивает расхождение, если инвалидация что-то пропустит.
+    """
+    key = 'posts:count:{}:{}:{}'.format(
+        *scope, versions.signature([EPOCH, scope]))
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.add(key, count, timeout)
+    return count
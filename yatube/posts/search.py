@@ -0,0 +1,185 @@
+import math
+import re
+from collections import Counter
+
+from core.slugify.slugify import alphabet
+from django.db import connection
+from django.db.models import F
+
+from .models import Post, SearchPosting, SearchTerm
+
+FTS_TABLE = 'posts_post_fts'
+SEARCH_LIMIT = 1000
+# Сколько постингов самого редкого терма читается на запрос.
+POSTINGS_LIMIT = 5 * SEARCH_LIMIT
+# Служебный терм-счётчик: documents = число проиндексированных постов.
+DOCUMENTS = ''
+
+_word = re.compile(r'\w{2,}')
+
+
+def normalize(text):
+    """Текст -> список термов: нижний регистр и транслитерация core.slugify.
+
+    Запросы и посты нормализуются одинаково, поэтому «Привет» найдётся
+    и по «привет», и по «privet».
+    """
+    text = ''.join(alphabet.get(char, char) for char in text.lower())
+    return _word.findall(text)
+
+
+class FTS5Backend:
+    """Индекс в виртуальной таблице SQLite FTS5, ранжирование bm25."""
+    name = 'fts5'
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                [post.pk, ' '.join(normalize(post.text))])
+
+    def index_many(self, posts):
+        posts = list(posts)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [[post.pk] for post in posts])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                [[post.pk, ' '.join(normalize(post.text))]
+                 for post in posts])
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        terms = normalize(query)
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank, rowid DESC LIMIT %s', [match, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class InvertedIndexBackend:
+    """Инвертированный индекс в таблицах SearchTerm/SearchPosting, tf-idf.
+
+    Число документов для idf хранится в служебном терме DOCUMENTS, чтобы
+    не считать посты на каждый запрос. Поиск читает не больше
+    POSTINGS_LIMIT самых новых постингов самого редкого терма, остальные
+    термы проверяются только по этим кандидатам.
+    """
+    name = 'inverted'
+
+    def index(self, post):
+        self.remove(post.pk)
+        frequencies = Counter(normalize(post.text))
+        if not frequencies:
+            return
+
+        SearchTerm.objects.bulk_create(
+            [SearchTerm(term=term) for term in [DOCUMENTS, *frequencies]],
+            ignore_conflicts=True)
+        terms = SearchTerm.objects.filter(term__in=frequencies)
+        SearchPosting.objects.bulk_create(
+            SearchPosting(term=term, post_id=post.pk,
+                          weight=frequencies[term.term])
+            for term in terms)
+        SearchTerm.objects.filter(
+            term__in=[DOCUMENTS, *frequencies]
+        ).update(documents=F('documents') + 1)
+
+    def index_many(self, posts):
+        for post in posts:
+            self.index(post)
+
+    def remove(self, post_id):
+        postings = SearchPosting.objects.filter(post_id=post_id)
+        if SearchTerm.objects.filter(
+            pk__in=postings.values('term_id')
+        ).update(documents=F('documents') - 1):
+            SearchTerm.objects.filter(
+                term=DOCUMENTS).update(documents=F('documents') - 1)
+            postings.delete()
+
+    def clear(self):
+        SearchPosting.objects.all().delete()
+        SearchTerm.objects.all().delete()
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        words = set(normalize(query))
+        if not words:
+            return []
+        terms = {
+            term: (pk, documents)
+            for term, pk, documents in SearchTerm.objects.filter(
+                term__in=[DOCUMENTS, *words], documents__gt=0
+            ).values_list('term', 'pk', 'documents')}
+        total = terms.pop(DOCUMENTS, (None, 1))[1]
+        if len(terms) < len(words):
+            return []
+
+        idf = {pk: math.log(1 + total / documents)
+               for pk, documents in terms.values()}
+        rarest, *others = sorted(idf, key=idf.get, reverse=True)
+        scores = {
+            post_id: weight * idf[rarest]
+            for post_id, weight in SearchPosting.objects.filter(
+                term_id=rarest
+            ).order_by('-post_id').values_list(
+                'post_id', 'weight')[:POSTINGS_LIMIT]}
+        for term_id in others:
+            scores = {
+                post_id: scores[post_id] + weight * idf[term_id]
+                for post_id, weight in SearchPosting.objects.filter(
+                    term_id=term_id, post_id__in=list(scores)
+                ).values_list('post_id', 'weight')}
+        ranked = sorted(scores, key=lambda pk: (scores[pk], pk), reverse=True)
+        return ranked[:limit]
+
+
+_backend = None
+
+
+def fts5_available():
+    if connection.vendor != 'sqlite':
+        return False
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if fts5_available():
+            _backend = FTS5Backend()
+        else:
+            _backend = InvertedIndexBackend()
+    return _backend
+
+
+def index_posts(post_ids):
+    """Индексирует (заново) посты post_ids."""
+    get_backend().index_many(
+        Post.objects.filter(pk__in=post_ids).only('pk', 'text'))
+
+
+def rebuild():
+    """Переиндексирует все посты, возвращает их число."""
+    backend = get_backend()
+    backend.clear()
+    count = 0
+    for post in Post.objects.only('pk', 'text').iterator(chunk_size=1000):
+        backend.index(post)
+        count += 1
+    return count
@@ -0,0 +1,108 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (counters, graph, invalidation, search, thumbnails, timeline,
+               trending)
+from .models import Comment, Follow, Group, Post, User, rows_updated
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # при переносе в другую группу меняется и лента прежней группы
+    instance._previous_group_id = None
+    if instance.pk is not None:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.add_to_author(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+        trending.post_created(instance)
+    invalidation.invalidate(invalidation.post_scopes(
+        [instance.pk], [instance.author_id],
+        [instance.group_id, getattr(instance, '_previous_group_id', None)]))
+    search.get_backend().index(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # до каскада: вхождения нужны, чтобы уменьшить счётчики термов
+    search.get_backend().remove(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.add_to_author(instance.author_id, 'posts_count', -1)
+    invalidation.invalidate(invalidation.post_scopes(
+        [instance.pk], [instance.author_id], [instance.group_id]))
+    thumbnails.discard(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.add_to_post(instance.post_id, 1)
+        trending.comment_added(instance)
+    invalidation.invalidate(invalidation.comment_scopes([instance.post_id]))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.add_to_post(instance.post_id, -1)
+    invalidation.invalidate(invalidation.comment_scopes([instance.post_id]))
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if created:
+        invalidation.invalidate([('group', instance.pk)])
+    else:
+        invalidation.invalidate(invalidation.group_scopes([instance.pk]))
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # посты группы обнулили group_id без сигналов: их не перечислить
+    invalidation.invalidate([invalidation.EPOCH])
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        counters.create_author(instance.pk)
+        return
+    # вход в систему обновляет только last_login — страницы не меняются
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    invalidation.invalidate(invalidation.user_scopes([instance.pk]))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.add_to_author(instance.author_id, 'followers_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        graph.journal((graph.FOLLOW, instance.user_id, instance.author_id))
+    invalidation.invalidate(invalidation.follow_scopes(
+        [(instance.user_id, instance.author_id)]))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.add_to_author(instance.author_id, 'followers_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    graph.journal((graph.UNFOLLOW, instance.user_id, instance.author_id))
+    invalidation.invalidate(invalidation.follow_scopes(
+        [(instance.user_id, instance.author_id)]))
+
+
+@receiver(rows_updated)
+def rows_updated_received(sender, rows, fields, **kwargs):
+    invalidation.rows_changed(sender, rows, fields)
+    if sender is Follow:
+        # рёбра поменялись пачкой: графы процессов соберутся заново
+        graph.journal((graph.RESET, 0, 0))
@@ -0,0 +1,11 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.fragments import render_card
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post):
+    return mark_safe(render_card(post))
@@ -0,0 +1,16 @@
+from django import template
+from django.core.paginator import Paginator
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page_obj, on_each_side=2, on_ends=1):
+    """Первые, последние и соседние с текущей номера страниц.
+
+    Число ссылок не зависит от числа страниц; None стоит на месте пропуска.
+    """
+    pages = page_obj.paginator.get_elided_page_range(
+        page_obj.number, on_each_side=on_each_side, on_ends=on_ends)
+    return [None if number == Paginator.ELLIPSIS else number
+            for number in pages]
@@ -0,0 +1,11 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, geometry, **options):
+    """Готовая миниатюра или None, если пул её ещё не нарисовал."""
+    return thumbnails.lookup(post, geometry, **options)
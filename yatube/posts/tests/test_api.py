@@ -0,0 +1,115 @@
+import gzip
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import api
+from .utils import Utils
+
+
+class ApiTests(TestCase, Utils):
+    def setUp(self):
+        cache.clear()
+        self.author, _ = self.new_unique_user()
+        self.reader, _ = self.new_unique_user()
+        self.group, *_ = self.new_group(slug='api')
+        self.new_follow(self.reader, self.author)
+        self.posts = [
+            self.new_post(self.author, group=self.group)[0]
+            for _ in range(api.PER_PAGE + 3)]
+        self.new_comment(self.reader, self.posts[0])
+        self.client = Client()
+
+    def get(self, url, client=None, **params):
+        response = (client or self.client).get(url, params)
+        body = b''.join(response) if response.streaming else response.content
+        return response, json.loads(body)
+
+    def walk(self, url, client=None, **params):
+        """Все страницы выдачи по курсору next."""
+        seen, cursor = [], ''
+        while cursor is not None:
+            response, data = self.get(url, client, cursor=cursor, **params)
+            self.assertEqual(response.status_code, 200)
+            seen += data['results']
+            cursor = data['next']
+        return seen
+
+    def test_feeds_match_html_order(self):
+        expected = [post.pk for post in reversed(self.posts)]
+        reader = Client()
+        reader.force_login(self.reader)
+        urls = [
+            (reverse('posts:api_index'), None),
+            (reverse('posts:api_group_list', args=[self.group.slug]), None),
+            (reverse('posts:api_profile', args=[self.author.username]),
+             None),
+            (reverse('posts:api_follow_index'), reader),
+        ]
+        for url, client in urls:
+            with self.subTest(url=url):
+                seen = self.walk(url, client)
+                self.assertEqual([row['id'] for row in seen], expected)
+                self.assertEqual(seen[0]['author'], self.author.username)
+                self.assertEqual(seen[0]['group'], self.group.slug)
+
+    def test_sparse_fields_and_limit(self):
+        response, data = self.get(
+            reverse('posts:api_index'), fields='text,id', limit=2)
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(list(data['results'][0]), ['text', 'id'])
+        self.assertEqual(data['results'][0]['text'], self.posts[-1].text)
+
+        for params in ({'fields': 'id,password'}, {'limit': 0},
+                       {'limit': 'many'}):
+            with self.subTest(params=params):
+                response, data = self.get(
+                    reverse('posts:api_index'), **params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', data)
+
+    def test_reads_values_in_one_query(self):
+        url = reverse('posts:api_index')
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            # штампы versions в кэше, остаётся сама выборка
+            b''.join(self.client.get(url))
+
+    def test_post_and_comments(self):
+        post = self.posts[0]
+        response, data = self.get(
+            reverse('posts:api_post_detail', args=[post.pk]),
+            fields='id,comments_count,image')
+        self.assertEqual(data, {
+            'id': post.pk, 'comments_count': 1, 'image': None})
+
+        comments = self.walk(
+            reverse('posts:api_post_comments', args=[post.pk]))
+        self.assertEqual(
+            [comment['author'] for comment in comments],
+            [self.reader.username])
+
+        response, data = self.get(
+            reverse('posts:api_post_comments', args=[post.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_needs_login_and_gzip(self):
+        response, data = self.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.get(
+            reverse('posts:api_index'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(b''.join(response)))
+        self.assertEqual(len(data['results']), api.PER_PAGE)
+
+    def test_not_modified(self):
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.new_post(self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,82 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import Http404
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import async_views, views
+from .utils import Utils
+
+
+class AsyncViewsTests(TestCase, Utils):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user, cls.user_name = cls.new_unique_user()
+        cls.reader, _ = cls.new_unique_user()
+        cls.group, *_ = cls.new_group()
+        cls.post, cls.post_text = cls.new_post(cls.user, group=cls.group)
+        cls.comment_text = cls.new_comment(cls.reader, cls.post)
+        cls.new_follow(cls.reader, cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def request(self, user=None, **params):
+        request = RequestFactory().get('/', params)
+        request.user = user or AnonymousUser()
+        return request
+
+    def call(self, view, *args, **kwargs):
+        return async_to_sync(view)(*args, **kwargs)
+
+    def test_pages_match_sync_views(self):
+        pages = [
+            ('index', (), {}),
+            ('group_posts', (), {'slug': self.group.slug}),
+            ('profile', (), {'username': self.user_name}),
+            ('follow_index', (), {}),
+        ]
+        for name, args, kwargs in pages:
+            with self.subTest(view=name):
+                cache.clear()
+                expected = getattr(views, name)(
+                    self.request(self.reader), *args, **kwargs)
+                cache.clear()
+                received = self.call(getattr(async_views, name),
+                                     self.request(self.reader),
+                                     *args, **kwargs)
+                self.assertEqual(received.status_code, 200)
+                self.assertEqual(received.content, expected.content)
+
+    def test_profile_uses_author_counter(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.call(
+                async_views.profile, self.request(), username=self.user_name)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('COUNT(' in query['sql'].upper()
+                             for query in queries))
+
+    def test_post_detail(self):
+        response = self.call(async_views.post_detail,
+                             self.request(self.reader), post_id=self.post.pk)
+        self.assertContains(response, self.post_text)
+        self.assertContains(response, self.comment_text)
+
+    def test_cursor_mode(self):
+        response = self.call(async_views.index, self.request(cursor=''))
+        self.assertContains(response, self.post_text)
+
+    def test_not_found(self):
+        with self.assertRaises(Http404):
+            self.call(async_views.profile, self.request(), username='nobody')
+        with self.assertRaises(Http404):
+            self.call(async_views.group_posts, self.request(), slug='nope')
+
+    def test_follow_index_requires_login(self):
+        response = self.call(async_views.follow_index, self.request())
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/auth/login/', response.url)
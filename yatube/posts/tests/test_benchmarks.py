@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import resolve
+
+from ..models import AuthorStats, Follow, Post, Timeline
+from .. import benchmarks, urls
+
+
+REDIRECTS = {'add_comment', 'profile_follow', 'profile_unfollow'}
+
+
+class BenchmarkTests(TestCase):
+    def test_seed_and_measure(self):
+        call_command('seed_posts', users=30, posts=120, groups=3,
+                     follows=3, comments=50, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertGreater(Follow.objects.count(), 0)
+        self.assertEqual(
+            Timeline.objects.count(),
+            Post.objects.filter(author__following__isnull=False).count())
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('posts_count', flat=True)),
+            120)
+        # даты разнесены, а не совпадают до секунды
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 100)
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command('bench_posts', depths='1,2', repeat=2,
+                         output=output, stdout=StringIO())
+            with open(output, encoding='utf-8') as file:
+                report = json.load(file)
+
+        results = report['results']
+        self.assertIn('index@2', results)
+        self.assertIn('post_edit', results)
+        for name, result in results.items():
+            with self.subTest(page=name):
+                self.assertEqual(
+                    result['status'], 302 if name in REDIRECTS else 200)
+                # прогретая главная обходится кэшем без запросов к базе
+                if not name.startswith('index'):
+                    self.assertGreater(result['queries'], 0)
+        self.assertTrue(list(benchmarks.compare(report, report)))
+
+        report = benchmarks.api_vs_html(2, log=lambda line: None)
+        self.assertIn('follow_index', report['results'])
+        for name, result in report['results'].items():
+            with self.subTest(api=name):
+                self.assertEqual(
+                    {kind: row['status'] for kind, row in result.items()},
+                    {'html': 200, 'api': 200, 'api_gzip': 200})
+                # короткие тела gzip_page оставляет как есть
+                self.assertLessEqual(
+                    result['api_gzip']['bytes'], result['api']['bytes'])
+
+    def test_targets_cover_every_route(self):
+        call_command('seed_posts', users=10, posts=30, groups=2,
+                     follows=3, comments=10, stdout=StringIO())
+        covered = {
+            resolve(url).url_name
+            for _, url, _, _ in benchmarks.targets([1])}
+        self.assertEqual(
+            covered, {pattern.name for pattern in urls.urlpatterns})
@@ -0,0 +1,67 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import views
+from ..models import Comment
+from .utils import Utils
+
+
+class CommentPageTests(TestCase, Utils):
+    def setUp(self):
+        cache.clear()
+        self.user, _ = self.new_unique_user()
+        self.post, _ = self.new_post(self.user)
+        self.client = Client()
+        self.detail = reverse('posts:post_detail', args=[self.post.pk])
+        self.more = reverse('posts:post_comments', args=[self.post.pk])
+
+    def add_comments(self, count=views.COMMENTS_PER_PAGE * 2 + 5):
+        for _ in range(count):
+            self.new_comment(self.user, self.post)
+
+    def test_detail_renders_first_page(self):
+        self.add_comments()
+        response = self.client.get(self.detail)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), views.COMMENTS_PER_PAGE)
+        self.assertEqual(
+            list(comments), list(Comment.objects.order_by('created', 'pk')[
+                :views.COMMENTS_PER_PAGE]))
+        self.assertContains(response, comments.next_cursor)
+
+    def test_detail_queries_do_not_grow(self):
+        self.assert_constant_queries(
+            self.client, self.detail, self.add_comments)
+
+    def test_fragments_cover_all_comments(self):
+        self.add_comments()
+        comments = self.client.get(self.detail).context['comments']
+        seen = list(comments)
+        while comments.has_next():
+            response = self.client.get(
+                self.more, {'cursor': comments.next_cursor})
+            self.assertTemplateUsed(response, 'includes/comments.html')
+            self.assertTemplateNotUsed(response, 'base.html')
+            comments = response.context['comments']
+            seen += list(comments)
+        self.assertEqual(
+            [comment.pk for comment in seen],
+            list(Comment.objects.order_by('created', 'pk').values_list(
+                'pk', flat=True)))
+
+    def test_json(self):
+        self.add_comments(views.COMMENTS_PER_PAGE + 1)
+        data = self.client.get(self.more, {'format': 'json'}).json()
+        self.assertEqual(len(data['comments']), views.COMMENTS_PER_PAGE)
+        self.assertEqual(data['comments'][0]['author'], self.user.username)
+
+        data = self.client.get(
+            self.more, {'format': 'json', 'cursor': data['next']}).json()
+        self.assertEqual(len(data['comments']), 1)
+        self.assertIsNone(data['next'])
+
+    def test_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 100]))
+        self.assertEqual(response.status_code, 404)
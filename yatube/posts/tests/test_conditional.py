@@ -0,0 +1,138 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from .. import async_views
+from .utils import Utils
+
+
+class ConditionalGetTests(TestCase, Utils):
+    def setUp(self):
+        cache.clear()
+        self.user, self.user_name = self.new_unique_user()
+        self.reader, _ = self.new_unique_user()
+        self.group, *_ = self.new_group()
+        self.other_group, *_ = self.new_group()
+        self.post, _ = self.new_post(self.user, group=self.group)
+        self.guest = Client()
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[self.group.slug]),
+            'profile': reverse('posts:profile', args=[self.user_name]),
+            'detail': reverse('posts:post_detail', args=[self.post.pk]),
+        }
+
+    def etags(self, client=None):
+        client = client or self.guest
+        return {name: client.get(url)['ETag']
+                for name, url in self.urls.items()}
+
+    def test_unchanged_page_is_not_rendered(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.guest.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header('Last-Modified'))
+
+                with self.assertNumQueries(0 if name == 'index' else 1):
+                    cached = self.guest.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(cached.content, b'')
+                self.assertEqual(cached['ETag'], response['ETag'])
+
+                cached = self.guest.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(cached.status_code, 304)
+
+    def test_new_post_changes_feeds(self):
+        before = self.etags()
+        self.new_post(self.user, group=self.group)
+        after = self.etags()
+        # главная — см. test_new_post_is_never_hidden_behind_not_modified
+        for name in ('group', 'profile'):
+            self.assertNotEqual(before[name], after[name])
+
+    def test_new_post_is_never_hidden_behind_not_modified(self):
+        url = self.urls['index']
+        first = self.guest.get(url)
+        post, _ = self.new_post(self.user, text='Свежий пост на главной')
+        # лента главной заморожена: 304 подтверждает то же тело, что
+        # отдал бы полный ответ
+        self.assertEqual(
+            self.guest.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            .status_code, 304)
+        self.assertNotContains(self.guest.get(url), post.text)
+
+        cache.delete(f'posts:frozen:{url}')
+        response = self.guest.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, post.text)
+        self.assertEqual(
+            self.guest.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            .status_code, 304)
+
+    def test_post_moved_between_groups(self):
+        other_url = reverse('posts:group_list', args=[self.other_group.slug])
+        before = self.etags()
+        other_before = self.guest.get(other_url)['ETag']
+
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertNotEqual(before['group'], self.etags()['group'])
+        self.assertNotEqual(other_before, self.guest.get(other_url)['ETag'])
+
+    def test_comment_changes_only_post_page(self):
+        before = self.etags()
+        self.new_comment(self.reader, self.post)
+        after = self.etags()
+        self.assertNotEqual(before['detail'], after['detail'])
+        self.assertEqual(before['index'], after['index'])
+
+    def test_follow_changes_profile(self):
+        before = self.etags()
+        self.new_follow(self.reader, self.user)
+        self.assertNotEqual(before['profile'], self.etags()['profile'])
+
+    def test_etag_depends_on_user_and_page(self):
+        client = Client()
+        client.force_login(self.reader)
+        self.assertNotEqual(self.etags()['index'], self.etags(client)['index'])
+        self.assertNotEqual(
+            self.guest.get(self.urls['index'])['ETag'],
+            self.guest.get(self.urls['index'], {'page': 2})['ETag'])
+
+    def test_new_session_renders_fresh_csrf_token(self):
+        self.reader.set_password('secret')
+        self.reader.save()
+        client = Client(enforce_csrf_checks=True)
+        url = self.urls['detail']
+        client.login(username=self.reader.username, password='secret')
+        etag = client.get(url)['ETag']
+        client.logout()
+        client.login(username=self.reader.username, password='secret')
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'после входа',
+             'csrfmiddlewaretoken': response.context['csrf_token']})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.post.comments.filter(
+            text='после входа').exists())
+
+    def test_missing_objects_have_no_etag(self):
+        response = self.guest.get(
+            reverse('posts:group_list', args=['no-such-group']))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_async_view_returns_not_modified(self):
+        etag = self.guest.get(self.urls['index'])['ETag']
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH=etag)
+        request.user = AnonymousUser()
+        response = async_to_sync(async_views.index)(request)
+        self.assertEqual(response.status_code, 304)
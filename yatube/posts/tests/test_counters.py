@@ -0,0 +1,63 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import AuthorStats, Post
+from .utils import Utils
+
+
+class CountersTests(TestCase, Utils):
+    def setUp(self):
+        self.author, self.author_name = self.new_unique_user()
+        self.reader, _ = self.new_unique_user()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def stats(self):
+        return AuthorStats.objects.get(user=self.author)
+
+    def test_counters_follow_writes_and_deletes(self):
+        post, _ = self.new_post(self.author)
+        self.new_post(self.author)
+        self.new_comment(self.reader, post)
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author_name}))
+
+        self.assertEqual(self.stats().posts_count, 2)
+        self.assertEqual(self.stats().followers_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author_name}))
+        post.delete()
+        self.assertEqual(self.stats().posts_count, 1)
+        self.assertEqual(self.stats().followers_count, 0)
+
+    def test_profile_uses_counters(self):
+        for _ in range(3):
+            self.new_post(self.author)
+        self.new_follow(self.reader, self.author)
+
+        response = self.client.get(reverse(
+            'posts:profile', kwargs={'username': self.author_name}))
+        self.assertEqual(response.context['posts_count'], 3)
+        self.assertEqual(response.context['subscribers'], 1)
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+
+    def test_reconcile_repairs_drift(self):
+        post, _ = self.new_post(self.author)
+        self.new_comment(self.reader, post)
+        AuthorStats.objects.filter(user=self.author).update(
+            posts_count=7, followers_count=3)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(self.stats().posts_count, 1)
+        self.assertEqual(self.stats().followers_count, 0)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
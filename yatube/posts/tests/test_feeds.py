@@ -0,0 +1,71 @@
+import json
+from xml.etree import ElementTree
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .utils import Utils
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+class FeedTests(TestCase, Utils):
+    def setUp(self):
+        cache.clear()
+        self.author, self.author_name = self.new_unique_user()
+        self.group, self.group_title, _ = self.new_group()
+        self.post, self.post_text = self.new_post(
+            self.author, group=self.group, text='Первый пост <b>& co</b>')
+        self.new_post(self.author)
+        self.client = Client()
+
+    def body(self, response):
+        if response.streaming:
+            return b''.join(response.streaming_content).decode()
+        return response.content.decode()
+
+    def test_formats(self):
+        url = reverse('posts:group_feed', args=[self.group.slug, 'rss'])
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Type'], 'application/rss+xml; charset=utf-8')
+        channel = ElementTree.fromstring(self.body(response)).find('channel')
+        self.assertIn(self.group_title, channel.findtext('title'))
+        self.assertEqual(
+            [item.findtext('description')
+             for item in channel.iter('item')], [self.post_text])
+
+        url = reverse('posts:profile_feed', args=[self.author_name, 'atom'])
+        feed = ElementTree.fromstring(self.body(self.client.get(url)))
+        self.assertEqual(len(feed.findall(f'{ATOM}entry')), 2)
+        self.assertTrue(feed.findtext(f'{ATOM}updated'))
+
+        url = reverse('posts:index_feed', args=['json'])
+        feed = json.loads(self.body(self.client.get(url)))
+        self.assertEqual(len(feed['items']), 2)
+        self.assertTrue(feed['items'][1]['url'].endswith(
+            reverse('posts:post_detail', args=[self.post.pk])))
+
+    def test_unknown_scope_or_format(self):
+        for url in (reverse('posts:index_feed', args=['html']),
+                    reverse('posts:group_feed', args=['no-such', 'rss'])):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_cached_and_invalidated_by_new_post(self):
+        url = reverse('posts:index_feed', args=['rss'])
+        first = self.client.get(url)
+        self.body(first)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertFalse(cached.streaming)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code,
+            304)
+
+        self.new_post(self.author, text='Свежий пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Свежий пост', self.body(response))
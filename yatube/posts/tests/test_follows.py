@@ -0,0 +1,65 @@
+from array import array
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import follows
+from ..models import Follow
+from .utils import Utils
+
+
+class FollowStateTests(TestCase, Utils):
+    def setUp(self):
+        cache.clear()
+        self.reader, _ = self.new_unique_user()
+        self.authors = [self.new_unique_user()[0] for _ in range(5)]
+        for author in self.authors[:3]:
+            self.new_follow(self.reader, author)
+
+    def test_batch_needs_one_query(self):
+        ids = [author.pk for author in self.authors]
+        with self.assertNumQueries(1):
+            state = follows.FollowState(self.reader.pk)
+            following = state.following(ids)
+            self.assertTrue(state.follows(ids[0]))
+        self.assertEqual(
+            [following[pk] for pk in ids], [True, True, True, False, False])
+
+    def test_cached_as_sorted_array(self):
+        ids = follows.followee_ids(self.reader.pk)
+        self.assertIsInstance(ids, array)
+        self.assertEqual(
+            list(ids), sorted(author.pk for author in self.authors[:3]))
+        with self.assertNumQueries(0):
+            self.assertEqual(follows.followee_ids(self.reader.pk), ids)
+
+    def test_follow_and_unfollow_invalidate(self):
+        client = Client()
+        client.force_login(self.reader)
+        follows.followee_ids(self.reader.pk)
+        newcomer = self.authors[4]
+
+        client.get(reverse('posts:profile_follow', args=[newcomer.username]))
+        self.assertIn(newcomer.pk, follows.followee_ids(self.reader.pk))
+
+        client.get(
+            reverse('posts:profile_unfollow', args=[newcomer.username]))
+        self.assertNotIn(newcomer.pk, follows.followee_ids(self.reader.pk))
+
+        Follow.objects.filter(
+            user=self.reader, author=self.authors[0]).update(author=newcomer)
+        self.assertEqual(
+            list(follows.followee_ids(self.reader.pk)),
+            sorted(author.pk for author in self.authors[1:3] + [newcomer]))
+
+    def test_profile_and_anonymous(self):
+        self.assertFalse(follows.FollowState(None).follows(self.authors[0].pk))
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(
+            reverse('posts:profile', args=[self.authors[0].username]))
+        self.assertTrue(response.context['following'])
+        response = client.get(
+            reverse('posts:profile', args=[self.authors[4].username]))
+        self.assertFalse(response.context['following'])
@@ -0,0 +1,52 @@
+from django.test import Client, TestCase
+from django.core.cache import cache
+from django.urls import reverse
+
+from .. import fragments
+from .utils import Utils
+
+
+class PostCardCacheTests(TestCase, Utils):
+    def setUp(self):
+        cache.clear()
+        fragments.stats.clear()
+        self.user, _ = self.new_unique_user()
+        self.group, *_ = self.new_group()
+        self.post, _ = self.new_post(self.user, group=self.group)
+        self.client = Client()
+
+    def test_unchanged_card_served_from_cache(self):
+        first = fragments.render_card(self.post)
+        second = fragments.render_card(self.post)
+        self.assertEqual(first, second)
+        self.assertEqual(fragments.stats['miss'], 1)
+        self.assertEqual(fragments.stats['hit'], 1)
+
+    def test_card_rerenders_on_changes(self):
+        fragments.render_card(self.post)
+
+        self.post.text = 'Отредактированный текст'
+        self.post.save()
+        self.assertIn('Отредактированный текст',
+                      fragments.render_card(self.post))
+
+        self.group.title = 'Новое имя группы'
+        self.group.save()
+        self.assertIn('Новое имя группы', fragments.render_card(self.post))
+
+        self.user.first_name = 'Иван'
+        self.user.last_name = 'Петров'
+        self.user.save()
+        self.assertIn('Иван Петров', fragments.render_card(self.post))
+        self.assertEqual(fragments.stats['miss'], 4)
+        self.assertEqual(fragments.stats['hit'], 0)
+
+    def test_feed_uses_card_cache(self):
+        follower, _ = self.new_unique_user()
+        self.new_follow(follower, self.user)
+        self.client.force_login(follower)
+
+        self.client.get(reverse('posts:follow_index'))
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, self.post.text)
+        self.assertEqual(fragments.stats['hit'], 1)
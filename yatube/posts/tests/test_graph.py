@@ -0,0 +1,115 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import graph, versions
+from ..invalidation import EPOCH
+from ..models import Follow
+from .utils import Utils
+
+
+@override_settings(POSTS_FOLLOW_GRAPH=True)
+class FollowGraphTests(TestCase, Utils):
+    def setUp(self):
+        cache.clear()
+        graph._graph = None
+        self.users = [self.new_unique_user()[0] for _ in range(5)]
+        first, second, third, fourth, fifth = self.pks = [
+            user.pk for user in self.users]
+        with self.captureOnCommitCallbacks(execute=True):
+            for user, author in [(0, 1), (1, 0), (0, 2), (1, 3), (2, 3),
+                                 (2, 4), (3, 4)]:
+                self.new_follow(self.users[user], self.users[author])
+
+    def follow(self, user, author):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.new_follow(self.users[user], self.users[author])
+
+    def test_queries(self):
+        first, second, third, fourth, fifth = self.pks
+        follow_graph = graph.get_graph()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                list(follow_graph.followees(first)), [second, third])
+            self.assertEqual(follow_graph.follower_count(fourth), 2)
+            self.assertEqual(follow_graph.followee_count(first), 2)
+            self.assertEqual(follow_graph.mutual(first), [second])
+            # fourth читают двое из подписок, fifth — один
+            self.assertEqual(
+                follow_graph.suggestions(first), [(fourth, 2), (fifth, 1)])
+
+    def test_follow_and_unfollow_replayed(self):
+        first, second, third, fourth, fifth = self.pks
+        before = graph.get_graph()
+        self.follow(0, 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.get(
+                user=self.users[0], author=self.users[1]).delete()
+
+        follow_graph = graph.get_graph()
+        self.assertIs(follow_graph.out_targets, before.out_targets)
+        self.assertEqual(list(follow_graph.followees(first)), [third, fourth])
+        self.assertEqual(list(follow_graph.followers(second)), [])
+        self.assertEqual(follow_graph.mutual(first), [])
+        self.assertTrue(follow_graph.follows(first, fourth))
+        self.assertFalse(follow_graph.follows(first, second))
+        self.assertIs(graph.get_graph(), follow_graph)
+
+    def test_returned_graph_never_changes(self):
+        first, second, third, fourth, fifth = self.pks
+        before = graph.get_graph()
+        self.follow(0, 3)
+        self.assertTrue(graph.get_graph().follows(first, fourth))
+        self.assertFalse(before.follows(first, fourth))
+        self.assertEqual(list(before.followees(first)), [second, third])
+        self.assertEqual(before.changes, 0)
+
+    def test_reload_on_bulk_changes(self):
+        first, second, third, fourth, fifth = self.pks
+        before = graph.get_graph()
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(
+                user=self.users[0], author=self.users[2]).update(
+                author=self.users[4])
+        after = graph.get_graph()
+        self.assertIsNot(after, before)
+        self.assertEqual(list(after.followees(first)), [second, fifth])
+
+        versions.bump(EPOCH)
+        self.assertIsNot(graph.get_graph(), after)
+
+    def test_lost_journal_reloads(self):
+        before = graph.get_graph()
+        self.follow(4, 0)
+        cache.delete(graph._change_key(before.seq + 1))
+        follow_graph = graph.get_graph()
+        self.assertIsNot(follow_graph, before)
+        self.assertTrue(follow_graph.follows(self.pks[4], self.pks[0]))
+
+    def test_compaction(self):
+        first, second, third, fourth, fifth = self.pks
+        follow_graph = graph.FollowGraph.load()
+        newcomer = self.new_unique_user()[0].pk
+        with mock.patch.object(graph, 'COMPACT_LIMIT', 2):
+            follow_graph.follow(newcomer, first)
+            follow_graph.unfollow(first, second)
+            follow_graph.follow(fifth, first)
+        self.assertEqual(follow_graph.changes, 0)
+        self.assertEqual(list(follow_graph.followers(first)), [
+            second, fifth, newcomer])
+        self.assertEqual(list(follow_graph.followees(first)), [third])
+
+    def test_benchmark_command(self):
+        call_command('bench_follow_graph', samples=3, stdout=StringIO())
+
+    @override_settings(POSTS_FOLLOW_GRAPH=False)
+    def test_disabled_graph_keeps_no_journal(self):
+        cache.delete(graph.SEQ_KEY)
+        self.follow(4, 0)
+        self.assertIsNone(cache.get(graph.SEQ_KEY))
+        with self.assertRaises(ImproperlyConfigured):
+            graph.get_graph()
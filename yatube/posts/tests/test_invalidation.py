@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import versions
+from ..invalidation import EPOCH, INDEX
+from ..models import Comment, Follow, Group, Post
+from .utils import Utils
+
+
+class InvalidationTests(TestCase, Utils):
+    def setUp(self):
+        cache.clear()
+        self.author, self.author_name = self.new_unique_user()
+        self.reader, _ = self.new_unique_user()
+        self.group, *_ = self.new_group()
+        self.other_group, *_ = self.new_group()
+        self.post, _ = self.new_post(self.author, group=self.group)
+        self.new_follow(self.reader, self.author)
+
+    def stamps(self, *scopes):
+        return versions.get_many(list(scopes))
+
+    def assert_bumped(self, change, *scopes, untouched=()):
+        before = self.stamps(*scopes, *untouched)
+        change()
+        after = self.stamps(*scopes, *untouched)
+        for scope, old, new in zip(scopes + untouched, before, after):
+            with self.subTest(scope=scope):
+                if scope in scopes:
+                    self.assertNotEqual(old, new)
+                else:
+                    self.assertEqual(old, new)
+
+    def test_new_post_reaches_follower_timeline(self):
+        self.assert_bumped(
+            lambda: self.new_post(self.author),
+            INDEX, ('author', self.author.pk),
+            ('timeline', self.reader.pk),
+            untouched=(('group', self.group.pk),))
+
+    def test_queryset_update(self):
+        self.assert_bumped(
+            lambda: Post.objects.filter(pk=self.post.pk).update(
+                group=self.other_group),
+            INDEX, ('post', self.post.pk), ('group', self.group.pk),
+            ('group', self.other_group.pk), ('timeline', self.reader.pk))
+
+    def test_comment_touches_only_post(self):
+        self.assert_bumped(
+            lambda: self.new_comment(self.reader, self.post),
+            ('post', self.post.pk),
+            untouched=(INDEX, ('author', self.author.pk)))
+        self.assert_bumped(
+            lambda: Comment.objects.filter(post=self.post).update(text='1'),
+            ('post', self.post.pk), untouched=(INDEX,))
+
+    def test_unfollow_view(self):
+        client = Client()
+        client.force_login(self.reader)
+        self.assert_bumped(
+            lambda: client.get(reverse(
+                'posts:profile_unfollow', args=[self.author_name])),
+            ('author', self.author.pk), ('timeline', self.reader.pk))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_renamed_author(self):
+        self.new_comment(self.author, self.post)
+
+        def rename():
+            self.author.first_name = 'Новое имя'
+            self.author.save()
+
+        self.assert_bumped(
+            rename, INDEX, ('user', self.author.pk),
+            ('group', self.group.pk), ('post', self.post.pk),
+            ('timeline', self.reader.pk))
+
+    def test_renamed_group(self):
+        def rename():
+            self.group.title = 'Новое имя'
+            self.group.save()
+
+        self.assert_bumped(
+            rename, INDEX, ('group', self.group.pk),
+            ('timeline', self.reader.pk),
+            untouched=(('group', self.other_group.pk),))
+
+    def test_unlisted_changes_bump_epoch(self):
+        with mock.patch('posts.models.UPDATE_ROWS_LIMIT', 0):
+            self.assert_bumped(
+                lambda: Post.objects.update(text='Новый текст'), EPOCH)
+        self.assert_bumped(
+            lambda: Group.objects.filter(pk=self.group.pk).delete(), EPOCH)
+
+    def test_follow_page_not_modified(self):
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:follow_index')
+        etag = client.get(url)['ETag']
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.new_post(self.author)
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,77 @@
+from django.test import Client, TestCase, override_settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.urls import reverse
+
+from ..models import Post
+from ..pagination import CursorPaginator, decode_cursor, encode_cursor
+from .utils import Utils
+
+
+class CursorPaginationTests(TestCase, Utils):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user, cls.user_name = cls.new_unique_user()
+        for _ in range(25):
+            cls.new_post(cls.user)
+        # половина постов с одинаковой датой: порядок решает id
+        Post.objects.filter(pk__lte=12).update(pub_date=timezone.now())
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def walk(self, paginator):
+        page = paginator.get_page(None)
+        pages = [page]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+        return pages
+
+    def test_cursor_roundtrip(self):
+        post = Post.objects.first()
+        token = encode_cursor('n', post.pub_date, post.pk)
+        self.assertEqual(decode_cursor(token), ('n', post.pub_date, post.pk))
+        self.assertIsNone(decode_cursor('garbage!'))
+
+    def test_forward_walk_covers_all_posts(self):
+        pages = self.walk(CursorPaginator(Post.objects.all(), 10))
+        received = [post.pk for page in pages for post in page]
+        self.assertEqual(received, self.expected)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertFalse(pages[0].has_previous())
+
+    def test_backward_walk(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        last = self.walk(paginator)[-1]
+        middle = paginator.get_page(last.previous_cursor)
+        self.assertEqual([post.pk for post in middle], self.expected[10:20])
+        first = paginator.get_page(middle.previous_cursor)
+        self.assertEqual([post.pk for post in first], self.expected[:10])
+        self.assertFalse(first.has_previous())
+
+    def test_view_cursor_mode(self):
+        response = self.client.get(reverse('posts:index') + '?cursor=')
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.is_cursor)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.user_name}),
+            {'cursor': page_obj.next_cursor})
+        received = [post.pk for post in response.context['page_obj']]
+        self.assertEqual(received, self.expected[10:20])
+        self.assertEqual(response.context['posts_count'], 25)
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_cursor_mode_without_count(self):
+        with self.assertNumQueries(1):
+            CursorPaginator(Post.objects.all(), 10).get_page(None)
+        response = self.client.get(reverse('posts:index'))
+        self.assertTrue(response.context['page_obj'].is_cursor)
@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from .utils import Utils
+
+
+class PageWindowTests(TestCase, Utils):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user, _ = cls.new_unique_user()
+        cls.group, *_ = cls.new_group()
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Пост номер {i}')
+            for i in range(300))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_links_are_bounded(self):
+        response = self.client.get(
+            reverse('posts:group_list', args=[self.group.slug]),
+            {'page': 15})
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 30)
+        content = response.content.decode()
+        for number in (1, 13, 14, 16, 17, 30):
+            self.assertIn(f'page={number}"', content)
+        for number in (2, 11, 19, 29):
+            self.assertNotIn(f'page={number}"', content)
+        self.assertEqual(content.count('&hellip;'), 2)
+
+    def test_count_cached_per_scope(self):
+        url = reverse('posts:group_list', args=[self.group.slug])
+        self.client.get(url, {'page': 2})
+        # ETag, группа и сама страница — без COUNT(*)
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'page': 3})
+        self.assertEqual(response.context['page_obj'].paginator.count, 300)
+
+        self.new_post(self.user, group=self.group)
+        response = self.client.get(url, {'page': 3})
+        self.assertEqual(response.context['page_obj'].paginator.count, 301)
@@ -0,0 +1,69 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .utils import Utils
+
+
+class FeedQueryCountTests(TestCase, Utils):
+    """Число SQL-запросов страницы не зависит от числа постов на ней."""
+
+    def setUp(self):
+        self.user, self.user_name = self.new_unique_user()
+        self.group, *_ = self.new_group()
+        self.post, _ = self.new_post(self.user, group=self.group)
+        followed, _ = self.new_unique_user()
+        self.new_post(followed)
+        self.new_follow(self.user, followed)
+
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def add_posts_by_other_authors(self):
+        for _ in range(8):
+            author, _ = self.new_unique_user()
+            group, *_ = self.new_group()
+            self.new_post(author, group=group)
+            self.new_follow(self.user, author)
+
+    def add_posts_to_group(self):
+        for _ in range(8):
+            author, _ = self.new_unique_user()
+            self.new_post(author, group=self.group)
+
+    def add_own_posts(self):
+        for _ in range(8):
+            group, *_ = self.new_group()
+            self.new_post(self.user, group=group)
+
+    def add_comments(self):
+        for _ in range(8):
+            author, _ = self.new_unique_user()
+            self.new_comment(author, self.post)
+
+    def test_index(self):
+        self.assert_constant_queries(
+            self.client, reverse('posts:index'),
+            self.add_posts_by_other_authors)
+
+    def test_follow_index(self):
+        self.assert_constant_queries(
+            self.client, reverse('posts:follow_index'),
+            self.add_posts_by_other_authors)
+
+    def test_group_list(self):
+        self.assert_constant_queries(
+            self.client,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            self.add_posts_to_group)
+
+    def test_profile(self):
+        self.assert_constant_queries(
+            self.client,
+            reverse('posts:profile', kwargs={'username': self.user_name}),
+            self.add_own_posts)
+
+    def test_post_detail(self):
+        self.assert_constant_queries(
+            self.client,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            self.add_comments)
@@ -0,0 +1,93 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .utils import Utils
+
+# любой SCAN: с псевдонимом (SCAN T0) и по индексу без условия тоже
+FULL_SCAN = re.compile(r'^SCAN ')
+# намеренные проходы по таблице: страница -> шаги плана
+ALLOWED_SCANS = {
+    'posts:index': {
+        # лента главной идёт по индексу даты и обрывается на LIMIT
+        'SCAN posts_post USING INDEX posts_post_pub_date_131c7f8d',
+        # число постов главной: один COUNT(*) на штамп ленты, см. cached_count
+        'SCAN posts_post USING COVERING INDEX posts_post_group_id_c91a8485',
+    },
+}
+
+
+class QueryPlanTests(TestCase, Utils):
+    """EXPLAIN QUERY PLAN для каждого SELECT, который выполняет страница."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user, cls.user_name = cls.new_unique_user()
+        cls.reader, _ = cls.new_unique_user()
+        cls.group, *_ = cls.new_group()
+        for _ in range(15):
+            post, _ = cls.new_post(cls.user, group=cls.group)
+        cls.post = post
+        cls.new_comment(cls.reader, cls.post)
+        cls.new_follow(cls.reader, cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def capture_selects(self, url, params=None):
+        queries = []
+
+        def collect(execute, sql, sql_params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, sql_params))
+            return execute(sql, sql_params, many, context)
+
+        with connection.execute_wrapper(collect):
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return queries
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, name, url, params=None):
+        allowed = ALLOWED_SCANS.get(name, set())
+        for sql, sql_params in self.capture_selects(url, params):
+            plan = self.explain(sql, sql_params)
+            for step in plan:
+                self.assertFalse(
+                    FULL_SCAN.match(step) and step not in allowed,
+                    f'\nfull scan in: {sql}\nplan: {plan}')
+                self.assertNotIn(
+                    'TEMP B-TREE', step, f'\nsort in: {sql}\nplan: {plan}')
+
+    def pages(self):
+        pages = [
+            ('posts:index', {}),
+            ('posts:group_list', {'slug': self.group.slug}),
+            ('posts:profile', {'username': self.user_name}),
+            ('posts:follow_index', {}),
+            ('posts:post_detail', {'post_id': self.post.pk}),
+        ]
+        return [(name, reverse(name, kwargs=kwargs))
+                for name, kwargs in pages]
+
+    def test_page_mode(self):
+        for name, url in self.pages():
+            with self.subTest(url=url):
+                self.assert_indexed(name, url, {'page': 2})
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_cursor_mode(self):
+        for name, url in self.pages():
+            with self.subTest(url=url):
+                self.assert_indexed(name, url)
@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import SearchTerm
+from ..search import (DOCUMENTS, FTS5Backend, InvertedIndexBackend,
+                      fts5_available, normalize)
+from .utils import Utils
+
+
+class SearchBackendMixin(Utils):
+    backend = None
+
+    def setUp(self):
+        self.user, _ = self.new_unique_user()
+        self.post_hello, _ = self.new_post(
+            self.user, text='Привет, мир! Привет всем читателям')
+        self.post_world, _ = self.new_post(self.user, text='Мир тесен')
+        self.post_other, _ = self.new_post(self.user, text='Совсем другое')
+        for post in (self.post_hello, self.post_world, self.post_other):
+            self.backend.index(post)
+
+    def test_ranked_results(self):
+        self.assertEqual(
+            self.backend.search('мир'),
+            [self.post_world.pk, self.post_hello.pk])
+        self.assertEqual(self.backend.search('привет'), [self.post_hello.pk])
+
+    def test_all_terms_required(self):
+        self.assertEqual(self.backend.search('привет мир'),
+                         [self.post_hello.pk])
+        self.assertEqual(self.backend.search('привет тесен'), [])
+
+    def test_transliterated_query(self):
+        self.assertEqual(self.backend.search('Privet'), [self.post_hello.pk])
+
+    def test_reindex_and_remove(self):
+        self.post_other.text = 'Теперь и здесь мир'
+        self.backend.index(self.post_other)
+        self.assertEqual(len(self.backend.search('мир')), 3)
+
+        self.backend.remove(self.post_world.pk)
+        self.assertNotIn(self.post_world.pk, self.backend.search('мир'))
+
+
+class InvertedIndexTests(SearchBackendMixin, TestCase):
+    backend = InvertedIndexBackend()
+
+    def test_document_frequencies(self):
+        self.backend.remove(self.post_hello.pk)
+        self.assertEqual(SearchTerm.objects.get(term='mir').documents, 1)
+        self.assertEqual(SearchTerm.objects.get(term='privet').documents, 0)
+
+    def test_document_counter(self):
+        counter = SearchTerm.objects.filter(term=DOCUMENTS)
+        self.assertEqual(counter.get().documents, 3)
+        self.backend.index(self.post_world)
+        self.backend.remove(self.post_other.pk)
+        self.backend.remove(self.post_other.pk)
+        self.assertEqual(counter.get().documents, 2)
+
+    def test_postings_read_per_term_are_bounded(self):
+        # термы + постинги редкого терма + постинги второго по кандидатам
+        with self.assertNumQueries(3):
+            self.assertEqual(self.backend.search('привет мир'),
+                             [self.post_hello.pk])
+        with mock.patch('posts.search.POSTINGS_LIMIT', 1):
+            self.assertEqual(self.backend.search('мир'),
+                             [self.post_world.pk])
+
+
+class FTS5Tests(SearchBackendMixin, TestCase):
+    backend = FTS5Backend()
+
+    def setUp(self):
+        if not fts5_available():
+            self.skipTest('SQLite собран без FTS5')
+        super().setUp()
+
+
+class SearchViewTests(TestCase, Utils):
+    def test_search_page(self):
+        user, _ = self.new_unique_user()
+        post, _ = self.new_post(user, text='Пост про котиков')
+        self.new_post(user, text='Пост про собак')
+
+        response = Client().get(reverse('posts:search'), {'q': 'котиков'})
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+        post.delete()
+        response = Client().get(reverse('posts:search'), {'q': 'котиков'})
+        self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_normalize(self):
+        self.assertEqual(normalize('Ёлка, и DJANGO!'), ['yolka', 'django'])
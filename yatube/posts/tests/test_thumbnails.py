@@ -0,0 +1,126 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from core.metrics import registry
+from core.routers import PIN_COOKIE
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.core.cache import cache
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from .. import thumbnails, versions
+from ..models import ImageJob
+from .utils import Utils
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TestCase, Utils):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user, _ = self.new_unique_user()
+        self.group, *_ = self.new_group()
+        self.post, *_ = self.new_post_with_img(self.user, self.group)
+
+    def ready(self):
+        return thumbnails.backend.lookup(self.post.image, GEOMETRY, **OPTIONS)
+
+    def test_lookup_never_renders(self):
+        self.assertIsNone(self.ready())
+        thumbnails.render_variants(self.post.image.name)
+        self.assertIsNotNone(self.ready())
+
+    def test_post_create_schedules_thumbnails(self):
+        client = Client()
+        client.force_login(self.user)
+        post, *_ = self.new_post_with_img(self.user, self.group)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('posts:post_create'), {
+                'text': 'Пост с картинкой',
+                'image': post.image.open('rb')})
+        created = self.user.posts.latest('pk')
+        thumbnail = thumbnails.backend.lookup(
+            created.image, GEOMETRY, **OPTIONS)
+        self.assertIsNotNone(thumbnail)
+
+    def test_backfill_command(self):
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertIsNotNone(self.ready())
+
+    def test_template_falls_back_to_original(self):
+        response = Client().get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertContains(response, self.post.image.url)
+        # страница только читает: ни заявки, ни записи в базу
+        self.assertFalse(ImageJob.objects.exists())
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_lookup_rejects_unknown_variant(self):
+        with self.assertRaises(ValueError):
+            thumbnails.lookup(self.post, '10x10')
+
+    def test_backfill_skips_queued_images(self):
+        call_command('generate_thumbnails', stdout=StringIO())
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertEqual(ImageJob.objects.count(), 1)
+        call_command('generate_thumbnails', force=True, stdout=StringIO())
+        self.assertEqual(ImageJob.objects.count(), 2)
+
+    def test_post_edit_purges_previous_image(self):
+        thumbnails.render_variants(self.post.image.name)
+        stale = self.ready()
+        previous = self.post.image
+        client = Client()
+        client.force_login(self.user)
+        other, *_ = self.new_post_with_img(self.user, self.group)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(
+                reverse('posts:post_edit', args=[self.post.pk]),
+                {'text': self.post.text, 'image': other.image.open('rb')})
+
+        self.post.refresh_from_db()
+        self.assertNotEqual(self.post.image.name, previous.name)
+        self.assertIsNotNone(self.ready())
+        self.assertIsNone(thumbnails.backend.lookup(
+            previous, GEOMETRY, **OPTIONS))
+        self.assertFalse(default.storage.exists(stale.name))
+        self.assertEqual(
+            set(ImageJob.objects.filter(post_id=self.post.pk).values_list(
+                'kind', 'status')),
+            {(ImageJob.RENDER, ImageJob.DONE),
+             (ImageJob.PURGE, ImageJob.DONE)})
+
+        metrics = registry.render()
+        self.assertIn('yatube_image_jobs{status="pending"} 0', metrics)
+        self.assertIn(
+            'yatube_image_job_duration_seconds_count{kind="purge"}', metrics)
+
+    def test_purge_keeps_shared_image(self):
+        thumbnails.render_variants(self.post.image.name)
+        thumbnails.purge_variants(self.post.image.name)
+        self.assertIsNotNone(self.ready())
+
+    def test_pending_jobs_command(self):
+        job = ImageJob.objects.create(
+            kind=ImageJob.RENDER, image=self.post.image.name,
+            post_id=self.post.pk)
+        stamp = versions.get_many([('post', self.post.pk)])
+        call_command('process_image_jobs', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(self.ready())
+        self.assertNotEqual(versions.get_many([('post', self.post.pk)]), stamp)
+        self.assertIn('yatube_image_job_duration_seconds_count{kind="render"}',
+                      registry.render())
@@ -0,0 +1,47 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Timeline
+from .utils import Utils
+
+
+class TimelineTests(TestCase, Utils):
+    def setUp(self):
+        self.reader, _ = self.new_unique_user()
+        self.author, self.author_name = self.new_unique_user()
+        self.old_post, _ = self.new_post(self.author)
+
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author_name}))
+        self.assertEqual(self.feed(), [self.old_post.pk])
+
+        new_post, _ = self.new_post(self.author)
+        self.assertEqual(self.feed(), [new_post.pk, self.old_post.pk])
+
+    def test_unfollow_prunes(self):
+        self.new_follow(self.reader, self.author)
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author_name}))
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+
+    def test_rebuild_command(self):
+        self.new_follow(self.reader, self.author)
+        Timeline.objects.all().delete()
+        Follow.objects.bulk_create([Follow(user=self.author,
+                                           author=self.reader)])
+
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.feed(), [self.old_post.pk])
+        self.assertEqual(Timeline.objects.count(), 1)
@@ -0,0 +1,111 @@
+import io
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import search, transfer
+from ..models import AuthorStats, Follow, Group, Post, Timeline, User
+from .utils import Utils
+
+
+class TransferTests(TestCase, Utils):
+    def setUp(self):
+        self.author, self.author_name = self.new_unique_user()
+        self.reader, self.reader_name = self.new_unique_user()
+        self.group, *_ = self.new_group(title='Котики')
+        self.post, self.post_text = self.new_post(
+            self.author, group=self.group)
+        self.new_post(self.reader)
+        self.comment_text = self.new_comment(self.reader, self.post)
+        self.new_follow(self.reader, self.author)
+
+    def test_ndjson_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dump.ndjson')
+            call_command('export_posts', output=path, stderr=StringIO())
+            pub_date = self.post.pub_date
+            User.objects.all().delete()
+            Group.objects.all().delete()
+            self.assertFalse(Post.objects.exists())
+
+            call_command('import_posts', path, batch_size=1,
+                         stdout=StringIO())
+
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, self.post_text)
+        self.assertEqual(post.author.username, self.author_name)
+        self.assertEqual(post.group.slug, self.group.slug)
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().text, self.comment_text)
+        self.assertEqual(post.author.stats.followers_count, 1)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertTrue(Follow.objects.filter(
+            user__username=self.reader_name,
+            author__username=self.author_name).exists())
+        self.assertEqual(Timeline.objects.count(), 1)
+
+    def test_csv_resolves_groups_by_slugify(self):
+        output = io.StringIO()
+        transfer.export_csv(output, 'groups')
+        self.assertIn(self.group.slug, output.getvalue())
+
+        groups = 'title,description\nСобачки,Про собак\n'
+        transfer.load(transfer.read_csv(io.StringIO(groups), 'groups'),
+                      derived=False, log=lambda line: None)
+        posts = (f'author,group,text\n{self.author_name},Собачки,Гав-гав\n'
+                 f'{self.author_name},Котики,Мяу-мяу\nnobody,,Ничей пост\n')
+        rate = transfer.load(transfer.read_csv(io.StringIO(posts), 'posts'),
+                             derived=False, log=lambda line: None)
+
+        self.assertEqual(rate.rows['posts'], 2)
+        self.assertEqual(rate.skipped['posts'], 1)
+        self.assertEqual(
+            Post.objects.get(text='Гав-гав').group.slug, 'sobachki')
+        self.assertEqual(
+            Post.objects.get(text='Мяу-мяу').group, self.group)
+
+    def test_repeated_import_skips_existing(self):
+        output = io.StringIO()
+        transfer.export_ndjson(output)
+        output.seek(0)
+        transfer.load(transfer.read_ndjson(output), log=lambda line: None)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_refuses_ids_taken_by_other_posts(self):
+        output = io.StringIO()
+        transfer.export_ndjson(output, kinds=('posts', 'comments'))
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.new_post(self.reader, id=self.post.pk, text='Чужой пост')
+        output.seek(0)
+
+        with self.assertRaisesMessage(ValueError, f'Пост {self.post.pk}'):
+            transfer.load(transfer.read_ndjson(output), derived=False,
+                          log=lambda line: None)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, 'Чужой пост')
+        self.assertFalse(post.comments.exists())
+
+    def test_derived_updates_only_touch_imported_rows(self):
+        other, _ = self.new_unique_user()
+        AuthorStats.objects.filter(user=other).update(posts_count=7)
+        posts = (f'author,text,pub_date\n{self.author_name},Загруженный пост,'
+                 f'2020-01-02T03:04:05+00:00\n')
+        transfer.load(transfer.read_csv(io.StringIO(posts), 'posts'),
+                      log=lambda line: None)
+
+        post = Post.objects.get(text='Загруженный пост')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(self.author.stats.posts_count, 2)
+        self.assertTrue(Timeline.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(
+            search.get_backend().search('загруженный'), [post.pk])
+        # счётчики авторов, которых загрузка не касалась, не пересчитаны
+        self.assertEqual(
+            AuthorStats.objects.get(user=other).posts_count, 7)
@@ -0,0 +1,92 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import GroupScore, Post, PostScore
+from .utils import Utils
+
+
+class TrendingTests(TestCase, Utils):
+    def setUp(self):
+        cache.clear()
+        self.user, _ = self.new_unique_user()
+        self.quiet_group, *_ = self.new_group()
+        self.busy_group, *_ = self.new_group()
+        self.quiet, _ = self.new_post(self.user, group=self.quiet_group)
+        self.busy, _ = self.new_post(self.user, group=self.busy_group)
+        self.plain, _ = self.new_post(self.user)
+        for _ in range(3):
+            self.new_comment(self.user, self.busy)
+
+    def scores(self, model):
+        return dict(model.objects.values_list('pk', 'score'))
+
+    def test_decay(self):
+        now = timezone.now()
+        self.assertAlmostEqual(
+            trending.exponent(now + trending.HALF_LIFE, 1)
+            - trending.exponent(now, 1), 1)
+        # два одинаковых события весят как одно вдвое большее
+        value = trending.exponent(now, 1)
+        self.assertAlmostEqual(
+            trending.combine(value, value), trending.exponent(now, 2))
+
+    def test_incremental_matches_refresh(self):
+        incremental = self.scores(PostScore), self.scores(GroupScore)
+        self.assertEqual(trending.refresh(), (3, 2))
+        for model, before in zip((PostScore, GroupScore), incremental):
+            after = self.scores(model)
+            self.assertEqual(set(after), set(before))
+            for pk, score in after.items():
+                self.assertAlmostEqual(score, before[pk], places=6)
+
+    def test_ranking(self):
+        self.assertEqual(
+            list(PostScore.objects.values_list('post_id', flat=True))[0],
+            self.busy.pk)
+        self.assertEqual(
+            list(GroupScore.objects.values_list('group_id', flat=True)),
+            [self.busy_group.pk, self.quiet_group.pk])
+
+        response = Client().get(reverse('posts:hot'))
+        self.assertEqual(response.context['page_obj'][0], self.busy)
+        self.assertEqual(
+            response.context['groups'], [self.busy_group, self.quiet_group])
+        response = Client().get(reverse('posts:hot_groups'))
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_new_comment_changes_page(self):
+        client = Client()
+        etag = client.get(reverse('posts:hot'))['ETag']
+        self.new_comment(self.user, self.plain)
+        response = client.get(
+            reverse('posts:hot'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_refresh_drops_cold_rows(self):
+        Post.objects.filter(pk=self.plain.pk).update(
+            pub_date=timezone.now() - timedelta(days=30))
+        out = StringIO()
+        call_command('refresh_trending', stdout=out)
+        self.assertIn('постов 2', out.getvalue())
+        self.assertFalse(PostScore.objects.filter(pk=self.plain.pk).exists())
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_cursor_pages(self):
+        for _ in range(12):
+            self.new_post(self.user)
+        client = Client()
+        response = client.get(reverse('posts:hot'))
+        seen = list(response.context['page_obj'])
+        response = client.get(reverse('posts:hot'), {
+            'cursor': response.context['page_obj'].next_cursor})
+        seen += list(response.context['page_obj'])
+        self.assertEqual(len(seen), 15)
+        self.assertEqual(len(set(seen)), 15)
+        self.assertEqual(seen[0], self.busy)
@@ -1,11 +1,17 @@
+from itertools import count
+
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.db import connection
 from ..models import Post, Group, Comment, Follow
 from faker import Faker
 
 User = get_user_model()
 Faker.seed(0)
 fake = Faker()
+_user_numbers = count(1)
 
 
 class Utils:
@@ -16,6 +22,13 @@ class Utils:
         user = User.objects.create_user(user_name)
         return user, user_name
 
+    @classmethod
+    def new_unique_user(cls):
+        """new_unique_user() -> User, user_name; имя с номером не повторится"""
+        user_name = f'{fake.first_name()}{next(_user_numbers)}'
+        user = User.objects.create_user(user_name)
+        return user, user_name
+
     @classmethod
     def new_post(cls, user, **kwargs):
         """new_post(User) -> Post, text"""
@@ -62,3 +75,20 @@ class Utils:
     def new_follow(cls, user, author):
         """new_follow(User_logged_in, User_2)"""
         Follow.objects.create(user=user, author=author)
+
+    def assert_constant_queries(self, client, url, add_rows):
+        """Число запросов к url не растёт после вызова add_rows()."""
+        def count():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                client.get(url)
+            return len(queries)
+
+        before = count()
+        add_rows()
+        after = count()
+        self.assertEqual(
+            before, after,
+            f'\nendpoint: {url}'
+            f'\nqueries before adding rows: {before}'
+            f'\nqueries after adding rows: {after}\n')
@@ -0,0 +1,233 @@
+"""Жизненный цикл картинок постов: миниатюры рисуются и убираются в фоне.
+
+Любая отрисовка и уборка — заявка ImageJob. Смена картинки в post_create и
+post_edit записывает заявки в той же транзакции, что и пост; картинки,
+загруженные раньше, ставит в очередь команда generate_thumbnails. После
+коммита все заявки уходят в пул через dispatch(), поэтому метрики очереди
+и перерисовка карточки одинаковы для всех путей. Шаблоны только читают
+готовые миниатюры через lookup() и ничего не пишут в базу. Заявка render
+рисует варианты POSTS_THUMBNAILS, purge удаляет миниатюры прежней картинки
+и их записи в KV-хранилище sorl. Заявки, которые не успели выполниться до
+перезапуска, подбирает команда process_image_jobs.
+"""
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+
+from core.metrics import registry
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import versions
+from .models import ImageJob, Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+JOB_WAIT = registry.histogram(
+    'yatube_image_job_wait_seconds',
+    'Time an image job spent queued before a worker took it, by kind.')
+JOB_TIME = registry.histogram(
+    'yatube_image_job_duration_seconds',
+    'Time a worker spent processing an image job, by kind.')
+
+
+class LookupBackend(ThumbnailBackend):
+    """Находит готовую миниатюру в KV-хранилище sorl, но никогда не рисует."""
+
+    def lookup(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        # опции дополняются так же, как в ThumbnailBackend.get_thumbnail,
+        # иначе имя файла миниатюры не совпадёт
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = LookupBackend()
+
+
+def render_variants(name):
+    """Рисует все варианты из POSTS_THUMBNAILS; выполняется в пуле."""
+    for geometry, options in settings.POSTS_THUMBNAILS:
+        get_thumbnail(name, geometry, **options)
+    return name
+
+
+def purge_variants(name):
+    """Удаляет миниатюры файла и их записи в KV; сам файл остаётся.
+
+    Если картинку ещё показывает другой пост, уборка пропускается.
+    """
+    if not Post.objects.filter(image=name).exists():
+        default.kvstore.delete(ImageFile(name, default.storage))
+    return name
+
+
+HANDLERS = {
+    ImageJob.RENDER: render_variants,
+    ImageJob.PURGE: purge_variants,
+}
+
+
+def run_job(job_id):
+    """Выполняет заявку; в пуле или синхронно.
+
+    Возвращает (kind, post_id, секунды в очереди, секунды работы, status)
+    или None, если заявку уже взял другой обработчик.
+    """
+    started = timezone.now()
+    claimed = ImageJob.objects.filter(
+        pk=job_id, status=ImageJob.PENDING).update(
+        status=ImageJob.RUNNING, started=started,
+        attempts=F('attempts') + 1)
+    if not claimed:
+        return None
+
+    job = ImageJob.objects.get(pk=job_id)
+    try:
+        HANDLERS[job.kind](job.image)
+    except Exception as error:
+        logger.error('Image job %s failed: %r', job_id, error)
+        job.status, job.error = ImageJob.FAILED, repr(error)
+    else:
+        job.status, job.error = ImageJob.DONE, ''
+    job.finished = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished'])
+    return (job.kind, job.post_id, (started - job.created).total_seconds(),
+            (job.finished - started).total_seconds(), job.status)
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker)
+    return _executor
+
+
+def _run_inline(function, *args):
+    """Синхронное выполнение для POSTS_THUMBNAIL_WORKERS = 0."""
+    future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+def _run(function, *args):
+    if not settings.POSTS_THUMBNAIL_WORKERS:
+        return _run_inline(function, *args)
+    return get_executor().submit(function, *args)
+
+
+def _job_done(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Image job crashed: %r', error)
+        return
+    if future.result() is None:
+        return
+    kind, post_id, wait, duration, status = future.result()
+    JOB_WAIT.observe(wait, kind=kind)
+    JOB_TIME.observe(duration, kind=kind)
+    if kind == ImageJob.RENDER and status == ImageJob.DONE and post_id:
+        # карточка с заглушкой перерисуется уже с готовой миниатюрой
+        versions.bump(('post', post_id))
+
+
+def dispatch(job_ids):
+    """Отдаёт записанные заявки пулу; единственный путь их выполнения."""
+    futures = []
+    for job_id in job_ids:
+        future = _run(run_job, job_id)
+        future.add_done_callback(_job_done)
+        futures.append(future)
+    return futures
+
+
+def run_jobs(job_ids):
+    """dispatch() с ожиданием; (выполнено, с ошибкой)."""
+    done = failed = 0
+    for future in dispatch(job_ids):
+        result = None if future.exception() else future.result()
+        if result is not None:
+            done += result[-1] == ImageJob.DONE
+            failed += result[-1] == ImageJob.FAILED
+    return done, failed
+
+
+def _enqueue(jobs):
+    # заявки коммитятся вместе с постом, в пул уходят после коммита
+    created = ImageJob.objects.bulk_create(jobs)
+    transaction.on_commit(partial(dispatch, [job.pk for job in created]))
+
+
+def schedule(post, previous=''):
+    """Миниатюры новой картинки поста и уборка прежней, previous."""
+    jobs = []
+    if post.image:
+        jobs.append(ImageJob(
+            kind=ImageJob.RENDER, image=post.image.name, post_id=post.pk))
+    if previous and previous != post.image.name:
+        jobs.append(ImageJob(
+            kind=ImageJob.PURGE, image=previous, post_id=post.pk))
+    if jobs:
+        _enqueue(jobs)
+
+
+def discard(post):
+    """Уборка миниатюр удалённого поста."""
+    if post.image:
+        _enqueue([ImageJob(
+            kind=ImageJob.PURGE, image=post.image.name, post_id=post.pk)])
+
+
+def collect_metrics(registry):
+    depth = registry.gauge(
+        'yatube_image_jobs', 'Image jobs not yet done, by status.')
+    unfinished = (ImageJob.PENDING, ImageJob.RUNNING, ImageJob.FAILED)
+    counts = dict(
+        ImageJob.objects.filter(status__in=unfinished).order_by()
+        .values_list('status').annotate(Count('pk')))
+    for status in unfinished:
+        depth.set(counts.get(status, 0), status=status)
+
+
+def lookup(post, geometry, **options):
+    """Готовая миниатюра или None, пока заявка render не выполнена.
+
+    Только чтение: рисуются лишь варианты POSTS_THUMBNAILS, поэтому другой
+    вариант — ошибка в шаблоне, а не повод ставить заявку.
+    """
+    if (geometry, options) not in settings.POSTS_THUMBNAILS:
+        raise ValueError(
+            f'Миниатюры {geometry} {options} нет в POSTS_THUMBNAILS')
+    if not post.image:
+        return None
+    return backend.lookup(post.image, geometry, **options)
@@ -0,0 +1,88 @@
+from collections import defaultdict
+
+from .models import Follow, Post, Timeline
+
+BATCH_SIZE = 1000
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=user_id, author_id=post.author_id, post=post,
+                  pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту читателя постами автора после подписки."""
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=user_id, author_id=author_id, post_id=pk,
+                  pub_date=pub_date)
+         for pk, pub_date in posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True)
+
+
+def fan_out_posts(post_ids):
+    """fan_out для пачки постов: подписчики автора читаются один раз."""
+    posts = defaultdict(list)
+    for pk, author_id, pub_date in Post.objects.filter(
+            pk__in=post_ids).values_list('pk', 'author_id', 'pub_date'):
+        posts[author_id].append((pk, pub_date))
+    followers = Follow.objects.filter(author_id__in=posts).values_list(
+        'user_id', 'author_id')
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=user_id, author_id=author_id, post_id=pk,
+                  pub_date=pub_date)
+         for user_id, author_id in followers.iterator()
+         for pk, pub_date in posts[author_id]),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True)
+
+
+def backfill_follows(pairs, last_post=None):
+    """backfill для пачки подписок (user_id, author_id): посты автора
+    читаются один раз. last_post — только посты с id не больше него:
+    более новые уже разложил fan_out_posts."""
+    readers = defaultdict(list)
+    for user_id, author_id in pairs:
+        readers[author_id].append(user_id)
+    posts = Post.objects.filter(author_id__in=readers)
+    if last_post is not None:
+        posts = posts.filter(pk__lte=last_post)
+    posts = posts.values_list('pk', 'author_id', 'pub_date')
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=user_id, author_id=author_id, post_id=pk,
+                  pub_date=pub_date)
+         for pk, author_id, pub_date in posts.iterator()
+         for user_id in readers[author_id]),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True)
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты читателя после отписки."""
+    Timeline.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты с нуля, возвращает число подписок."""
+    follows = Follow.objects.all()
+    timelines = Timeline.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+        timelines = timelines.filter(user_id__in=user_ids)
+
+    timelines.delete()
+    count = 0
+    for user_id, author_id in follows.values_list(
+            'user_id', 'author_id').iterator():
+        backfill(user_id, author_id)
+        count += 1
+    return count
@@ -0,0 +1,383 @@
+"""Потоковые выгрузка и загрузка данных posts в NDJSON и CSV.
+
+Используется командами export_posts и import_posts. Записи читаются и
+пишутся по одной, в базу попадают пачками bulk_create в транзакциях, поэтому
+память не зависит от размера файла. Пользователи и группы связываются по
+username и slug, посты сохраняют свои id: по ним на них ссылаются
+комментарии.
+Повторная загрузка пропускает существующих пользователей, группы, посты и
+подписки; у комментариев естественного ключа нет, они добавятся снова.
+Если id поста из файла в базе занят другим постом, загрузка прерывается.
+Ленты, счётчики и поисковый индекс после загрузки обновляются только для
+затронутых ею постов, авторов и подписок.
+"""
+import csv
+import functools
+import itertools
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from core.slugify.slugify import slugify
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import counters, invalidation, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 5000
+CHUNK_SIZE = 2000
+
+KINDS = ('users', 'groups', 'posts', 'comments', 'follows')
+FIELDS = {
+    'users': ('username', 'first_name', 'last_name', 'email', 'password',
+              'date_joined'),
+    'groups': ('slug', 'title', 'description'),
+    'posts': ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+    'comments': ('post', 'author', 'text', 'created'),
+    'follows': ('user', 'author'),
+}
+
+
+class Rate:
+    """Счётчик строк и скорости загрузки по видам записей."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.rows = dict.fromkeys(KINDS, 0)
+        self.skipped = dict.fromkeys(KINDS, 0)
+
+    @property
+    def total(self):
+        return sum(self.rows.values())
+
+    def per_second(self):
+        return self.total / max(time.monotonic() - self.started, 1e-9)
+
+    def lines(self):
+        for kind in KINDS:
+            if self.rows[kind] or self.skipped[kind]:
+                yield (f'{kind}: {self.rows[kind]} '
+                       f'(пропущено {self.skipped[kind]})')
+        yield (f'всего {self.total} строк за '
+               f'{time.monotonic() - self.started:.1f}s, '
+               f'{self.per_second():.0f} строк/с')
+
+
+# выгрузка
+
+def _date(value):
+    return value.isoformat() if value else ''
+
+
+def _export_users(chunk_size):
+    rows = User.objects.order_by('pk').values_list(*FIELDS['users'])
+    for *values, joined in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(FIELDS['users'], (*values, _date(joined))))
+
+
+def _export_groups(chunk_size):
+    rows = Group.objects.order_by('pk').values_list(*FIELDS['groups'])
+    for values in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(FIELDS['groups'], values))
+
+
+def _export_posts(chunk_size):
+    rows = Post.objects.order_by('pk').values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date', 'image')
+    for pk, author, group, text, pub_date, image in rows.iterator(
+            chunk_size=chunk_size):
+        yield {'id': pk, 'author': author, 'group': group or '',
+               'text': text, 'pub_date': _date(pub_date),
+               'image': image or ''}
+
+
+def _export_comments(chunk_size):
+    rows = Comment.objects.order_by('pk').values_list(
+        'post_id', 'author__username', 'text', 'created')
+    for post, author, text, created in rows.iterator(chunk_size=chunk_size):
+        yield {'post': post, 'author': author, 'text': text,
+               'created': _date(created)}
+
+
+def _export_follows(chunk_size):
+    rows = Follow.objects.order_by('pk').values_list(
+        'user__username', 'author__username')
+    for values in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(FIELDS['follows'], values))
+
+
+EXPORTERS = {
+    'users': _export_users,
+    'groups': _export_groups,
+    'posts': _export_posts,
+    'comments': _export_comments,
+    'follows': _export_follows,
+}
+
+
+def export_rows(kind, chunk_size=CHUNK_SIZE):
+    """Записи одного вида словарями с полями FIELDS[kind]."""
+    if kind not in EXPORTERS:
+        raise ValueError(f'Неизвестный вид записей: {kind}')
+    return EXPORTERS[kind](chunk_size)
+
+
+def export_ndjson(file, kinds=KINDS, chunk_size=CHUNK_SIZE):
+    """Все виды в одном файле, по строке JSON с полем type на запись."""
+    count = 0
+    for kind in kinds:
+        for row in export_rows(kind, chunk_size):
+            file.write(json.dumps({'type': kind, **row}, ensure_ascii=False))
+            file.write('\n')
+            count += 1
+    return count
+
+
+def export_csv(file, kind, chunk_size=CHUNK_SIZE):
+    """CSV хранит записи одного вида: по файлу на вид."""
+    writer = csv.DictWriter(file, FIELDS[kind])
+    writer.writeheader()
+    count = 0
+    for row in export_rows(kind, chunk_size):
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+# загрузка
+
+def read_ndjson(file):
+    """(kind, запись) для каждой непустой строки."""
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            kind = row.pop('type')
+        except (ValueError, KeyError, AttributeError):
+            raise ValueError(f'Строка {number}: ожидается объект с type')
+        yield kind, row
+
+
+def read_csv(file, kind):
+    for row in csv.DictReader(file):
+        yield kind, row
+
+
+_slug = functools.lru_cache(maxsize=4096)(slugify)
+
+
+def _aware(value):
+    parsed = datetime.fromisoformat(value) if value else timezone.now()
+    if parsed.tzinfo is None:
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _user_ids(usernames):
+    return dict(User.objects.filter(
+        username__in=set(usernames)).values_list('username', 'pk'))
+
+
+def _build_users(rows):
+    for row in rows:
+        # без хэша пароль непригоден для входа, как после set_unusable
+        yield User(
+            username=row['username'],
+            first_name=row.get('first_name') or '',
+            last_name=row.get('last_name') or '',
+            email=row.get('email') or '',
+            password=row.get('password') or '!',
+            date_joined=_aware(row.get('date_joined')))
+
+
+def _build_groups(rows):
+    for row in rows:
+        slug = _slug(row.get('slug') or row['title'])[:100]
+        yield Group(title=row['title'], slug=slug,
+                    description=row.get('description') or '')
+
+
+def _check_post_ids(rows):
+    """Id из файла, занятые в базе другим постом, — ошибка.
+
+    bulk_create(ignore_conflicts=True) молча пропустил бы такой пост, а
+    его комментарии достались бы чужому посту с тем же id. Тот же пост
+    (автор и дата публикации совпадают) — повторная загрузка, его просто
+    пропускаем.
+    """
+    wanted = {int(row['id']): row for row in rows if row.get('id')}
+    existing = Post.objects.filter(pk__in=wanted).values_list(
+        'pk', 'author__username', 'pub_date')
+    for pk, author, pub_date in existing.iterator(chunk_size=CHUNK_SIZE):
+        row = wanted[pk]
+        same = row['author'] == author and row.get('pub_date') and (
+            _aware(row['pub_date']) == pub_date)
+        if not same:
+            raise ValueError(
+                f'Пост {pk} уже есть в базе и это другой пост: загрузка '
+                f'сохраняет id, поэтому загружайте в пустую базу')
+
+
+def _build_posts(rows):
+    _check_post_ids(rows)
+    authors = _user_ids(row['author'] for row in rows)
+    # в файле может быть и slug, и название группы
+    groups = dict(Group.objects.filter(slug__in={
+        _slug(row['group']) for row in rows if row.get('group')
+    }).values_list('slug', 'pk'))
+
+    for row in rows:
+        if row['author'] in authors:
+            # без id база выдаст следующий номер сама
+            yield Post(
+                id=int(row['id']) if row.get('id') else None,
+                author_id=authors[row['author']],
+                group_id=groups.get(_slug(row['group']))
+                if row.get('group') else None,
+                text=row['text'],
+                pub_date=_aware(row.get('pub_date')),
+                image=row.get('image') or '')
+
+
+def _build_comments(rows):
+    authors = _user_ids(row['author'] for row in rows)
+    post_ids = set(Post.objects.filter(
+        pk__in={int(row['post']) for row in rows}).values_list(
+        'pk', flat=True))
+    for row in rows:
+        if row['author'] in authors and int(row['post']) in post_ids:
+            yield Comment(
+                post_id=int(row['post']), author_id=authors[row['author']],
+                text=row['text'], created=_aware(row.get('created')))
+
+
+def _build_follows(rows):
+    users = _user_ids(itertools.chain.from_iterable(
+        (row['user'], row['author']) for row in rows))
+    for row in rows:
+        if (row['user'] in users and row['author'] in users
+                and row['user'] != row['author']):
+            yield Follow(user_id=users[row['user']],
+                         author_id=users[row['author']])
+
+
+BUILDERS = {
+    'users': (User, _build_users),
+    'groups': (Group, _build_groups),
+    'posts': (Post, _build_posts),
+    'comments': (Comment, _build_comments),
+    'follows': (Follow, _build_follows),
+}
+
+
+@contextmanager
+def _dates_from_file(model):
+    """Снимает auto_now_add: иначе bulk_create затёр бы даты из файла."""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Touched:
+    """Что затронула загрузка: по этому обновляются производные таблицы."""
+
+    def __init__(self):
+        self.last_post = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.posts = set()
+        self.authors = set()
+        self.commented = set()
+        self.follows = set()
+
+    def add(self, kind, objects):
+        if kind == 'posts':
+            for post in objects:
+                if post.pk is not None:
+                    self.posts.add(post.pk)
+                self.authors.add(post.author_id)
+        elif kind == 'comments':
+            self.commented.update(comment.post_id for comment in objects)
+        elif kind == 'follows':
+            for follow in objects:
+                self.follows.add((follow.user_id, follow.author_id))
+                self.authors.add(follow.author_id)
+
+    def post_ids(self):
+        """Посты из файла с id и все, что получили id от базы."""
+        new = Post.objects.filter(pk__gt=self.last_post).values_list(
+            'pk', flat=True)
+        return self.posts.union(new.iterator(chunk_size=CHUNK_SIZE))
+
+
+def _chunks(values, size=CHUNK_SIZE):
+    values = sorted(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _flush(kind, rows, rate, touched):
+    """Пачка одним bulk_create; уже существующие строки пропускаются."""
+    model, build = BUILDERS[kind]
+    objects = list(build(rows))
+    with transaction.atomic(), _dates_from_file(model):
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+    touched.add(kind, objects)
+    rate.rows[kind] += len(objects)
+    rate.skipped[kind] += len(rows) - len(objects)
+
+
+def update_derived(touched):
+    """Ленты, счётчики и поиск для затронутого загрузкой.
+
+    Работа зависит от размера загрузки, а не всей базы. Повторно
+    загруженные строки обрабатываются ещё раз, это безопасно: счётчики
+    пересчитываются, строки лент и индекса заменяются.
+    """
+    post_ids = touched.post_ids()
+    for chunk in _chunks(touched.authors):
+        counters.reconcile_authors(chunk)
+    for chunk in _chunks(touched.commented):
+        counters.reconcile_posts(chunk)
+    for chunk in _chunks(post_ids):
+        timeline.fan_out_posts(chunk)
+        search.index_posts(chunk)
+    for chunk in _chunks(touched.follows):
+        timeline.backfill_follows(chunk, touched.last_post)
+
+
+def load(records, batch_size=BATCH_SIZE, derived=True, log=print):
+    """Загружает поток (kind, запись); записи вида идут подряд пачками.
+
+    Сигналы при такой вставке не шлются, поэтому производные таблицы (ленты,
+    счётчики, поиск) обновляются в конце для затронутого, если derived=True.
+    """
+    rate = Rate()
+    touched = Touched()
+    reported = 0
+    for kind, group in itertools.groupby(records, key=lambda r: r[0]):
+        if kind not in BUILDERS:
+            raise ValueError(f'Неизвестный вид записей: {kind}')
+        rows = (row for _, row in group)
+        while batch := list(itertools.islice(rows, batch_size)):
+            _flush(kind, batch, rate, touched)
+            if rate.total - reported >= batch_size * 20:
+                reported = rate.total
+                log(f'{rate.total} строк, {rate.per_second():.0f} строк/с')
+
+    if derived:
+        with transaction.atomic():
+            update_derived(touched)
+        log('derived tables updated')
+    invalidation.invalidate([invalidation.EPOCH])
+    for line in rate.lines():
+        log(line)
+    return rate
@@ -0,0 +1,112 @@
+"""«Горячие» посты и активные группы.
+
+Рейтинг — сумма весов событий (новый пост, комментарий), каждый из которых
+вдвое теряет вес за HALF_LIFE. Хранится он в логарифмической шкале:
+score = log2(Σ вес · 2^((t − ORIGIN) / HALF_LIFE)). Тогда порядок по score
+совпадает с порядком по затухшей сумме в любой момент, старые строки не
+нужно пересчитывать по таймеру, а новое событие с показателем x
+прибавляется одним UPDATE: score = max(score, x) + log2(1 + 2^−|score − x|).
+
+Сигналы post_save вызывают post_created и comment_added, штамп HOT при этом
+меняет invalidation. Команда
+refresh_trending пересобирает таблицы по событиям за WINDOW: выкидывает
+остывшие строки и исправляет то, что прошло мимо сигналов.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Greatest, Log, Power
+from django.utils import timezone
+
+from . import versions
+from .invalidation import HOT
+from .models import Comment, GroupScore, Post, PostScore
+
+HALF_LIFE = timedelta(hours=12)
+WINDOW = timedelta(days=7)
+ORIGIN = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+POST_WEIGHT = 2
+COMMENT_WEIGHT = 1
+
+
+def exponent(when, weight):
+    """Вклад события в логарифмической шкале рейтинга."""
+    return math.log2(weight) + (when - ORIGIN) / HALF_LIFE
+
+
+def combine(score, value):
+    """log2(2^score + 2^value) без переполнения."""
+    high, low = max(score, value), min(score, value)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def _add(model, pk, value):
+    """Атомарно прибавляет событие к рейтингу строки, создавая её."""
+    score = F('score')
+    combined = Greatest(score, Value(value)) + Log(
+        Value(2.0), 1 + Power(Value(2.0), -Abs(score - Value(value))))
+    rows = model.objects.filter(pk=pk)
+    if rows.update(score=combined):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(pk=pk, score=value)
+    except IntegrityError:
+        # строку успел создать параллельный запрос
+        rows.update(score=combined)
+
+
+def post_created(post):
+    value = exponent(post.pub_date, POST_WEIGHT)
+    _add(PostScore, post.pk, value)
+    if post.group_id:
+        _add(GroupScore, post.group_id, value)
+
+
+def comment_added(comment):
+    value = exponent(comment.created, COMMENT_WEIGHT)
+    _add(PostScore, comment.post_id, value)
+    group_id = Post.objects.filter(pk=comment.post_id).values_list(
+        'group_id', flat=True).first()
+    if group_id:
+        _add(GroupScore, group_id, value)
+
+
+def _accumulate(scores, key, value):
+    scores[key] = value if key not in scores else combine(scores[key], value)
+
+
+def refresh(now=None, window=WINDOW):
+    """Пересобирает рейтинги по событиям за window, возвращает
+    (число постов, число групп)."""
+    since = (now or timezone.now()) - window
+    posts, groups = {}, {}
+    rows = Post.objects.filter(pub_date__gte=since).values_list(
+        'pk', 'group_id', 'pub_date')
+    for pk, group_id, pub_date in rows.iterator(chunk_size=2000):
+        value = exponent(pub_date, POST_WEIGHT)
+        _accumulate(posts, pk, value)
+        if group_id:
+            _accumulate(groups, group_id, value)
+
+    rows = Comment.objects.filter(created__gte=since).values_list(
+        'post_id', 'post__group_id', 'created')
+    for post_id, group_id, created in rows.iterator(chunk_size=2000):
+        value = exponent(created, COMMENT_WEIGHT)
+        _accumulate(posts, post_id, value)
+        if group_id:
+            _accumulate(groups, group_id, value)
+
+    with transaction.atomic():
+        PostScore.objects.all().delete()
+        PostScore.objects.bulk_create(
+            (PostScore(post_id=pk, score=score)
+             for pk, score in posts.items()), batch_size=1000)
+        GroupScore.objects.all().delete()
+        GroupScore.objects.bulk_create(
+            (GroupScore(group_id=pk, score=score)
+             for pk, score in groups.items()), batch_size=1000)
+    versions.bump(HOT)
+    return len(posts), len(groups)
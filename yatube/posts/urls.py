@@ -1,21 +1,43 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import api, async_views, feeds, views
 
 app_name = 'posts'
 
+# под ASGI читающие страницы обслуживаются асинхронными версиями
+read_views = async_views if settings.POSTS_ASYNC_VIEWS else views
+
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('', read_views.index, name='index'),
+    path('posts/<int:post_id>/', read_views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('create/', views.post_create, name='post_create'),
-    path('group/<slug:slug>/', views.group_posts, name='group_list'),
-    path('profile/<str:username>/', views.profile, name='profile'),
-    path('follow/', views.follow_index, name='follow_index'),
+    path('group/<slug:slug>/', read_views.group_posts, name='group_list'),
+    path('profile/<str:username>/', read_views.profile, name='profile'),
+    path('follow/', read_views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('hot/', views.hot, name='hot'),
+    path('hot/groups/', views.hot_groups, name='hot_groups'),
+    path('feeds/<str:fmt>/', feeds.index_feed, name='index_feed'),
+    path('group/<slug:slug>/feed/<str:fmt>/', feeds.group_feed,
+         name='group_feed'),
+    path('profile/<str:username>/feed/<str:fmt>/', feeds.profile_feed,
+         name='profile_feed'),
     path('profile/<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('profile/<str:username>/unfollow/', views.profile_unfollow,
          name='profile_unfollow'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/posts/<int:post_id>/', api.post_detail,
+         name='api_post_detail'),
+    path('api/posts/<int:post_id>/comments/', api.post_comments,
+         name='api_post_comments'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group_list'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
 ]
@@ -0,0 +1,61 @@
+"""Штампы версий в кэше.
+
+Область (scope) — пара (kind, pk), перечень областей — в invalidation.
+Штамп — время последнего изменения области в наносекундах; из штампов
+складываются ключи кэша фрагментов и валидаторы условных GET.
+"""
+import time
+
+from core.routers import read_position
+from django.core.cache import cache
+
+
+def _key(kind, pk):
+    return f'posts:stamp:{kind}:{pk}'
+
+
+def bump(*scopes):
+    """bump(('post', 1), ('index', 0)) — новые штампы для областей."""
+    now = time.time_ns()
+    cache.set_many({_key(kind, pk): now for kind, pk in scopes}, None)
+
+
+def get_many(scopes):
+    """Штампы в порядке scopes; отсутствующие в кэше заводятся заново."""
+    keys = [_key(kind, pk) for kind, pk in scopes]
+    stamps = cache.get_many(keys)
+    missing = [key for key in keys if key not in stamps]
+    if missing:
+        # add не затирает штамп, который другой процесс успел поменять
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, None)
+        stamps.update(cache.get_many(missing))
+    return [stamps[key] for key in keys]
+
+
+def frozen(scopes, key, timeout):
+    """Штампы scopes, замороженные под key на timeout секунд.
+
+    Для страниц, которые кэшируются на время, а не по штампам: тело и
+    валидаторы такой страницы должны меняться одновременно.
+    """
+    key = f'posts:frozen:{key}'
+    stamps = cache.get(key)
+    if stamps is None:
+        # add: при гонке все процессы берут штампы того, кто успел первым
+        cache.add(key, get_many(scopes), timeout)
+        stamps = cache.get(key) or get_many(scopes)
+    return stamps
+
+
+def signature(scopes, frozen=()):
+    """Штампы областей одной строкой для ключа кэша.
+
+    frozen — уже полученные штампы, они идут в начало строки. Запрос,
+    читающий с реплики, дописывает её позицию из read_position(): данные
+    отстающей реплики не займут ключ свежих данных.
+    """
+    stamps = '.'.join(map(str, [*frozen, *get_many(scopes)]))
+    position = read_position()
+    return f'{stamps}@{position}' if position else stamps
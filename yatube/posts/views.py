@@ -1,59 +1,185 @@
+from core.routers import replica_reads
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
-
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.utils.http import urlencode
+
+from . import follows, thumbnails
+from .conditional import (INDEX_FRAGMENT_SECONDS, INDEX_FROZEN_SECONDS,
+                          conditional, group_scopes, hot_scopes,
+                          index_scopes, index_version, post_scopes,
+                          profile_scopes, timeline_scopes)
+from .counters import author_stats
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
+from .models import (Post, Group, User, Follow, Timeline, PostScore,
+                     GroupScore, Comment)
+from .invalidation import HOT, INDEX
+from .pagination import CursorPaginator, ascending_page, cached_count
+from .search import get_backend
+
+TIMELINE_KEYS = ('pub_date', 'post_id')
+HOT_KEYS = ('score', 'post_id')
+HOT_GROUPS = 10
+COMMENTS_PER_PAGE = 20
+
 
+def get_paginator_slice(post_list, request, count=None,
+                        keys=('pub_date', 'pk'), scope=None):
+    """Страница выборки; scope — область versions для кэша COUNT(*)."""
+    cursor = request.GET.get('cursor')
+    if cursor is not None or settings.POSTS_PAGINATION == 'cursor':
+        return CursorPaginator(post_list, 10, keys).get_page(cursor)
 
-def get_paginator_slice(post_list, request):
     paginator = Paginator(post_list, 10)
+    if count is None and scope is not None:
+        count = cached_count(post_list, scope)
+    if count is not None:
+        # известный заранее размер выборки избавляет от COUNT(*)
+        paginator.count = count
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
 
 
+def comment_page(post_id, cursor=None):
+    """Порция комментариев поста от старых к новым после cursor."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    return ascending_page(comments, cursor, COMMENTS_PER_PAGE)
+
+
+def get_timeline_slice(request):
+    """Страница ленты подписок: диапазон индекса Timeline без JOIN Follow."""
+    entries = Timeline.objects.filter(user=request.user).select_related(
+        'post__author', 'post__group')
+    page_obj = get_paginator_slice(
+        entries, request, keys=TIMELINE_KEYS,
+        scope=('timeline', request.user.id))
+    page_obj.object_list = [entry.post for entry in page_obj]
+    return page_obj
+
+
+@replica_reads
+@conditional(index_scopes, freeze=INDEX_FROZEN_SECONDS)
 def index(request):
-    post_list = Post.objects.all().select_related('group')
-    page_obj = get_paginator_slice(post_list, request)
+    post_list = Post.objects.for_feed()
+    page_obj = get_paginator_slice(post_list, request, scope=INDEX)
 
-    context = {'page_obj': page_obj, 'is_home_page': True}
+    context = {'page_obj': page_obj, 'is_home_page': True,
+               'feed_version': index_version(request),
+               'feed_timeout': INDEX_FRAGMENT_SECONDS}
     return render(request, 'posts/index.html', context)
 
 
+@replica_reads
+@conditional(hot_scopes)
+def hot(request):
+    """Посты по рейтингу posts.trending и самые активные группы."""
+    scores = PostScore.objects.select_related('post__author', 'post__group')
+    page_obj = get_paginator_slice(
+        scores, request, keys=HOT_KEYS, scope=HOT)
+    page_obj.object_list = [score.post for score in page_obj]
+    groups = [score.group for score in GroupScore.objects.select_related(
+        'group')[:HOT_GROUPS]]
+
+    context = {'page_obj': page_obj, 'groups': groups}
+    return render(request, 'posts/hot.html', context)
+
+
+@replica_reads
+@conditional(hot_scopes)
+def hot_groups(request):
+    scores = GroupScore.objects.select_related('group')
+    # групп немного, COUNT(*) по ним дёшев и без кэша
+    page_obj = get_paginator_slice(
+        scores, request, keys=('score', 'group_id'))
+    page_obj.object_list = [score.group for score in page_obj]
+
+    context = {'page_obj': page_obj}
+    return render(request, 'posts/hot_groups.html', context)
+
+
+@replica_reads
+@conditional(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = get_paginator_slice(post_list, request)
+    post_list = group.posts.for_feed()
+    page_obj = get_paginator_slice(
+        post_list, request, scope=('group', group.pk))
 
     context = {'group': group, 'page_obj': page_obj}
     return render(request, 'posts/group_list.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    post_ids = get_backend().search(query) if query else []
+    page_obj = Paginator(post_ids, 10).get_page(request.GET.get('page'))
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts]
+
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&'}
+    return render(request, 'posts/search.html', context)
+
+
+@replica_reads
+@conditional(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.for_detail(), pk=post_id)
+    comments = comment_page(post.pk, request.GET.get('comments'))
     form = CommentForm(request.POST or None)
 
     context = {'post': post, 'form': form, 'comments': comments}
     return render(request, 'posts/post_detail.html', context)
 
 
+@replica_reads
+@conditional(post_scopes)
+def post_comments(request, post_id):
+    """Следующая порция комментариев: HTML-фрагмент или ?format=json."""
+    comments = comment_page(post_id, request.GET.get('cursor'))
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404('Пост не найден')
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [{
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            } for comment in comments],
+            'next': comments.next_cursor,
+        })
+    context = {'post_id': post_id, 'comments': comments}
+    return render(request, 'includes/comments.html', context)
+
+
+@replica_reads
+@conditional(profile_scopes)
 def profile(request, username):
-    user_obj = get_object_or_404(User, username=username)
-    post_list = Post.objects.select_related('group').filter(author=user_obj)
-    page_obj = get_paginator_slice(post_list, request)
-    subscribers = user_obj.following.count()
+    user_obj = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    stats = author_stats(user_obj)
+    post_list = Post.objects.for_feed().filter(author=user_obj)
+    page_obj = get_paginator_slice(post_list, request, stats.posts_count)
 
     following = None
     if not request.user.is_anonymous:
-        following = user_obj.following.filter(user=request.user).exists()
+        following = follows.for_request(request).follows(user_obj.pk)
 
     context = {
         'page_obj': page_obj,
         'user_obj': user_obj,
         'following': following,
-        'subscribers': subscribers}
+        'subscribers': stats.followers_count,
+        'posts_count': stats.posts_count}
     return render(request, 'posts/profile.html', context)
 
 
@@ -63,6 +189,7 @@ def post_create(request):
     if form.is_valid():
         form.instance.author_id = request.user.id
         form.save()
+        thumbnails.schedule(form.instance)
         return redirect('posts:profile', username=request.user.username)
 
     return render(request, 'posts/create_post.html', {'form': form})
@@ -71,15 +198,19 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.id:
         raise PermissionDenied()
 
+    previous_image = post.image.name
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
         instance=post)
     if form.is_valid():
-        form.save()
+        # comments_count не перезаписываем устаревшим значением
+        form.instance.save(update_fields=form.Meta.fields)
+        if 'image' in form.changed_data:
+            thumbnails.schedule(form.instance, previous_image)
         return redirect('posts:post_detail', post_id=post_id)
 
     context = {'post': post, 'form': form, 'is_edit': True}
@@ -99,11 +230,10 @@ def add_comment(request, post_id):
 
 
 @login_required
+@replica_reads
+@conditional(timeline_scopes)
 def follow_index(request):
-    post = Post.objects.select_related(
-        'author'
-    ).filter(author__following__user=request.user)
-    page_obj = get_paginator_slice(post, request)
+    page_obj = get_timeline_slice(request)
 
     context = {'page_obj': page_obj, 'is_home_page': True}
     return render(request, 'posts/follow.html', context)
@@ -26,6 +26,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -36,10 +38,12 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = 'yatube.urls'
+TEST_RUNNER = 'core.test_runner.TestRunner'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени для core.middleware
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -59,8 +63,37 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
 }
+# PRAGMA для каждого нового соединения SQLite, см. core.sqlite
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    # отрицательное значение — размер в КиБ: 64 МиБ страниц на соединение
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# алиасы, с которых читают представления с replica_reads; пусто — всё
+# читается из default
+DATABASE_REPLICAS = []
+# локальные копии default, обновляются командой sync_replicas
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'{alias}.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+# 'round_robin' или 'random'
+DATABASE_REPLICA_POLICY = 'round_robin'
+# сколько секунд после записи пользователь читает только из default
+DATABASE_STICKY_SECONDS = 5
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
@@ -74,12 +107,44 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': auth + 'NumericPasswordValidator', },
 ]
 
+# 'shared' виден всем процессам сервера; его можно заменить на Redis или
+# Memcached, не трогая код. 'default' — LRU процесса перед 'shared'.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 60,
+            'CHECK_INTERVAL': 1,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
 
+# 'page' — номера страниц, 'cursor' — keyset-пагинация без COUNT(*)
+POSTS_PAGINATION = 'page'
+
+# варианты миниатюр, которые заранее рисует posts.thumbnails
+POSTS_THUMBNAILS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+# 0 — рисовать синхронно, без пула процессов
+POSTS_THUMBNAIL_WORKERS = 2
+# вести журнал подписок для графа в памяти (posts.graph); каждая подписка
+# тогда пишет в общий кэш
+POSTS_FOLLOW_GRAPH = False
+
+# core.middleware.MetricsMiddleware: доля замеряемых запросов,
+# порог числа SQL-запросов и адреса, которым доступен /metrics/
+METRICS_SAMPLE_RATE = 1.0
+METRICS_QUERY_BUDGET = 50
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'  # LOGOUT_REDIRECT_URL = '/auth/logout/'
@@ -100,6 +165,11 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 # Internationalization https://docs.djangoproject.com/en/2.2/topics/i18n/
 LANGUAGE_CODE = 'ru'
 WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
+# асинхронные версии index, group_posts, profile, post_detail, follow_index;
+# DebugToolbarMiddleware 3.x только синхронная — под ASGI уберите её из
+# MIDDLEWARE, иначе весь стек уйдёт в поток
+POSTS_ASYNC_VIEWS = False
 TIME_ZONE = 'UTC'
 USE_I18N = True
 USE_L10N = True
@@ -3,6 +3,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.contrib import admin
 
+from core.views import metrics
+
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 handler403 = 'core.views.permission_denied'
@@ -12,6 +14,7 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('about/', include('about.urls', namespace='about')),
     path('admin/', admin.site.urls),
+    path('metrics/', metrics, name='metrics'),
     path('auth/', include('django.contrib.auth.urls')),
 ]
 